@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+重複掲載の統合（sources/dedup.py）の確認とベンチマーク
+まとめるべき掲載・まとめてはいけない掲載の組を確かめてから、件数を変えて所要時間を計測します。
+確認に失敗した組があれば終了コード1で終わります。
+
+    python benchmarks/bench_dedup.py [イベント数]
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config  # noqa: E402
+from sources.base import Event, JST  # noqa: E402
+from sources.dedup import NearDuplicateDetector  # noqa: E402
+
+START = datetime(2026, 11, 14, 19, 0, tzinfo=JST)
+SHIBUYA = ("サンプルビル 10F", "東京都渋谷区道玄坂1-2-3")
+YOKOHAMA = ("サンプルスペース", "神奈川県横浜市西区みなとみらい2-3-4")
+ONLINE = ("オンライン", "オンライン")
+
+# (説明, まとめるべきか, [(event_id, タイトル, 主催者, (場所, 住所), 開始時刻のずれ（分）), ...])
+CASES = [
+    ("同じ主催者のオンライン/現地の掲載", True, [
+        (1, "データ分析勉強会 #42 〜pandasからPolarsへ〜", "データ分析勉強会", SHIBUYA, 0),
+        (2, "【オンライン】データ分析勉強会 #42 〜pandasからPolarsへ〜", "データ分析勉強会", ONLINE, 0),
+    ]),
+    ("別のグループからの長いタイトルの再掲載", True, [
+        (3, "Kaggle 振り返り会 〜コンペ上位解法を読む〜", "Kaggle振り返り会", SHIBUYA, 0),
+        (4, "Kaggle 振り返り会 〜コンペ上位解法を読む〜（再掲）", "Kaggle Tokyo", ONLINE, 0),
+    ]),
+    ("別の主催者・同じ会場の短いタイトル", True, [
+        (5, "もくもく会", "PyLadies Tokyo", SHIBUYA, 0),
+        (6, "もくもく会", "PyLadies Tokyo 運営", SHIBUYA, 0),
+    ]),
+    ("別の主催者・別の会場のもくもく会", False, [
+        (7, "もくもく会", "PyLadies Tokyo", SHIBUYA, 0),
+        (8, "もくもく会", "Rust.Tokyo", YOKOHAMA, 0),
+    ]),
+    ("別の主催者のLT会（どちらもオンライン）", False, [
+        (9, "LT会", "生成AI LT", ONLINE, 0),
+        (10, "LT会", "Python LT", ONLINE, 0),
+    ]),
+    ("別の主催者の生成AI勉強会", False, [
+        (11, "生成AI勉強会", "ML横浜", YOKOHAMA, 0),
+        (12, "生成AI勉強会", "データ分析勉強会", ONLINE, 0),
+    ]),
+    ("同じ主催者の回違い", False, [
+        (13, "データ分析勉強会 #42", "データ分析勉強会", SHIBUYA, 0),
+        (14, "データ分析勉強会 #43", "データ分析勉強会", SHIBUYA, 0),
+    ]),
+    ("同じ主催者・開始時刻が離れた回", False, [
+        (15, "もくもく会 午前の部", "PyLadies Tokyo", SHIBUYA, 0),
+        (16, "もくもく会 午前の部", "PyLadies Tokyo", SHIBUYA, 180),
+    ]),
+]
+
+
+def build_detector():
+    dedup = config.TECH_CONFIG["DEDUP"]
+    return NearDuplicateDetector(
+        similarity=dedup["SIMILARITY"],
+        similarity_other_owner=dedup["SIMILARITY_OTHER_OWNER"],
+        max_start_diff_minutes=dedup["MAX_START_DIFF_MINUTES"],
+        ignore_words=dedup["IGNORE_WORDS"],
+        min_title_length_other_owner=dedup["MIN_TITLE_LENGTH_OTHER_OWNER"],
+    )
+
+
+def make_event(event_id, title, owner, place, minutes):
+    return Event(
+        source="connpass", event_id=event_id, title=title, owner=owner,
+        place=place[0], address=place[1], started_at=START + timedelta(minutes=minutes),
+    )
+
+
+def check_cases(detector):
+    failures = 0
+    for label, should_merge, rows in CASES:
+        kept, _ = detector.dedup([make_event(*row) for row in rows])
+        merged = len(kept) == 1
+        failures += merged != should_merge
+        expected = "まとめる" if should_merge else "まとめない"
+        print(f"  {'✓' if merged == should_merge else '✗'} {label}: {expected}（{len(rows)}件 → {len(kept)}件）")
+    return failures
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    detector = build_detector()
+
+    print("=" * 60)
+    print("重複掲載の統合")
+    print("=" * 60)
+    failures = check_cases(detector)
+
+    # 組ごとに開催日をずらして count 件まで並べ、所要時間を測る（統合されるのは「まとめる」組だけ）
+    rows = [(day, row) for day, (_, _, case_rows) in enumerate(CASES) for row in case_rows]
+    events = []
+    for i in range(count):
+        day, (event_id, title, owner, place, minutes) = rows[i % len(rows)]
+        day += len(CASES) * (i // len(rows))
+        events.append(make_event(i, title, owner, place, minutes + 1440 * day))
+    t0 = time.perf_counter()
+    kept, clusters = detector.dedup(events)
+    elapsed = time.perf_counter() - t0
+    print(f"\n{count}件: {elapsed * 1000:.1f} ms ({elapsed / count * 1e6:.1f} µs/件), {len(kept)}件に統合 ({len(clusters)}グループ)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
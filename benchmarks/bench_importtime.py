@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+起動時間（インポート時間）のベンチマーク
+python -X importtime でエントリポイントと各ソースのインポート時間を計測し、
+時間のかかっているモジュールを表示します。
+
+    python benchmarks/bench_importtime.py [--repeat N] [--max-ms MS]
+
+--max-ms を指定すると、main のインポートがそれを超えたときに終了コード1で終わります（CI向け）。
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (表示名, 実行するインポート文)
+TARGETS = [
+    ("main", "import main"),
+    ("connpass のみ", "import main; from sources import load_source_class; load_source_class('connpass')"),
+    ("yokoari", "import main; from sources import load_source_class; load_source_class('yokoari')"),
+    ("Gemini SDK", "from sources.gemini import load_genai; load_genai()"),
+]
+TOP_N = 8
+
+
+def measure(statement):
+    """
+    1回分の計測結果を返す。
+    (インポート全体の時間 ms, {モジュール名: (self_us, cumulative_us)})
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    modules = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+        # インデントのない行がトップレベルのインポート（累積時間に配下が含まれる）
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative_us)
+    return total_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（最小値を採用）")
+    parser.add_argument("--max-ms", type=float, default=None, help="main のインポート時間の上限（ms）")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"インポート時間ベンチマーク ({sys.version.split()[0]}, {args.repeat}回中の最小値)")
+    print("=" * 60)
+
+    # インタプリタ起動時に必ず読み込まれる分（site など）は差し引く
+    baseline_ms, baseline_modules = min((measure("pass") for _ in range(args.repeat)), key=lambda r: r[0])
+    print(f"インタプリタ起動時の標準インポート: {baseline_ms:.1f} ms（以下の値から除外）")
+
+    main_ms = None
+    for label, statement in TARGETS:
+        total_ms, best = min((measure(statement) for _ in range(args.repeat)), key=lambda r: r[0])
+        total_ms = max(0.0, total_ms - baseline_ms)
+        if label == "main":
+            main_ms = total_ms
+
+        print(f"\n{label}: {total_ms:.1f} ms  ({statement})")
+        added = [(name, times) for name, times in best.items() if name not in baseline_modules]
+        heavy = sorted(added, key=lambda item: item[1][1], reverse=True)[:TOP_N]
+        for name, (self_us, cumulative_us) in heavy:
+            print(f"  {cumulative_us / 1000:8.1f} ms (self {self_us / 1000:6.1f} ms)  {name}")
+
+    if args.max_ms is not None and main_ms is not None and main_ms > args.max_ms:
+        print(f"\n❌ main のインポートが上限を超えました: {main_ms:.1f} ms > {args.max_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+オフラインの end-to-end ベンチマーク
+ネットワークにもAPIの利用枠にも触れずに main() を実行し、全体の処理時間とソースごとの所要時間を計測します。
+
+connpass API・会場のスケジュールページ・Slack はローカルのスタブサーバー（benchmarks/stub_server.py）が、
+Gemini は偽のモデルが応答します。キャッシュや状態の保存先は一時ディレクトリに切り替えるので、
+普段の .cache には影響しません。1回目はキャッシュなし、2回目以降は同じ状態を引き継いだ実行です。
+
+    python benchmarks/bench_offline.py [--connpass-events 10000] [--arena-months 12]
+                                       [--latency-ms 20] [--rate-limit-ratio 0.02] [--runs 2]
+                                       [--venues 30] [--subscribers 100]
+
+--venues を指定すると、横浜アリーナと同じ形式のページを返す会場をその数だけ config.VENUES に加え、
+それらをまとめて取得する "venues" ソース（VenueSource）も実行します。
+--subscribers を指定すると、キーワード・開催地・期間の異なる connpass の購読者をその数だけ config.SUBSCRIBERS に加えます。
+
+--max-seconds を指定すると、1回目の main() がそれを超えたときに終了コード1で終わります（CI向け）。
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config  # noqa: E402
+from stub_server import JST, StubServer  # noqa: E402
+
+
+class FakeGeminiModel:
+    """GenerativeModel の代わり。latency 秒待ってから予測のJSONを返す"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        prediction = {"level": "Lv.3(普通)", "peak_time": "17:00-18:00", "reason": "ベンチマーク用の予測"}
+        ids = re.findall(r"- id: (\d+)", prompt)
+        if ids:
+            text = json.dumps([dict(prediction, id=int(i)) for i in ids], ensure_ascii=False)
+        else:
+            text = json.dumps(prediction, ensure_ascii=False)
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 2, candidates_token_count=len(text) // 2)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+def configure(server, state_dir, args):
+    """config をスタブサーバーと一時ディレクトリに向ける"""
+    state_dir = Path(state_dir)
+    max_per_keyword = math.ceil(args.connpass_events * 1.1 / len(config.TECH_CONFIG["KEYWORDS"]))
+
+    config.TECH_CONFIG.update({
+        "API_URL": server.connpass_url,
+        "MAX_PAGES": math.ceil(max_per_keyword / config.TECH_CONFIG["PAGE_SIZE"]) + 1,
+        "REQUESTS_PER_SECOND": args.requests_per_second,
+        "STATE_PATH": str(state_dir / "events.sqlite3"),
+    })
+    today = datetime.now(JST).date()
+    end_month = (today.month - 1 + args.arena_months) % 12 + 1
+    end_year = today.year + (today.month - 1 + args.arena_months) // 12
+    lookahead_days = (datetime(end_year, end_month, 1).date() - today).days - 1
+    config.VENUES["yokohama_arena"]["url_template"] = server.arena_url + "{year}-{month:02d}"
+    config.YOKOARI_CONFIG["LOOKAHEAD_DAYS"] = lookahead_days
+    if args.venues:
+        keys = []
+        for i in range(args.venues):
+            key = f"bench_venue_{i:02d}"
+            config.VENUES[key] = dict(
+                config.VENUES["yokohama_arena"],
+                name=f"ベンチ会場{i:02d}",
+                url_template=server.venue_url(key) + "{year}-{month:02d}",
+            )
+            keys.append(key)
+        config.SOURCES.append({
+            "name": "venues",
+            "type": "venue",
+            "webhook": "SLACK_WEBHOOK_LIFE",
+            "options": {"VENUES": keys, "LOOKAHEAD_DAYS": lookahead_days},
+        })
+    config.GEMINI_CONFIG["PREDICTION_CACHE_PATH"] = str(state_dir / "predictions.sqlite3")
+    config.CONGESTION_MODEL_CONFIG["HISTORY_PATH"] = str(state_dir / "congestion_history.sqlite3")
+    config.HTTP_CACHE_CONFIG["DIR"] = str(state_dir / "http")
+    config.OUTBOX_CONFIG["PATH"] = str(state_dir / "outbox.sqlite3")
+    config.METRICS_CONFIG["DIR"] = str(state_dir / "metrics")
+    config.SLACK_CONFIG["MIN_INTERVAL_SECONDS"] = args.slack_interval
+    config.SCHEDULE_STATE_PATH = str(state_dir / "schedule.json")
+    config.ENABLED_SOURCES = None
+    config.CONNPASS_API_KEY = "offline-benchmark"
+    config.GEMINI_API_KEY = "offline-benchmark"
+
+    keywords = config.TECH_CONFIG["KEYWORDS"] + ["Rust", "LLM"]
+    locations = config.TECH_CONFIG["LOCATIONS"]
+    config.SUBSCRIBERS = [
+        {
+            "name": f"team{i:03d}",
+            "source": "connpass",
+            "webhook": f"BENCH_SUBSCRIBER_{i:03d}",
+            "keywords": [keywords[(i + k) % len(keywords)] for k in range(1 + i % 3)],
+            "exclude_keywords": ["もくもく"] if i % 5 == 0 else [],
+            "locations": [locations[i % len(locations)]],
+            "days_ahead": 7 + i % 24,
+        }
+        for i in range(args.subscribers)
+    ]
+
+    for spec in config.SOURCES + config.SUBSCRIBERS:
+        if spec.get("webhook"):
+            os.environ[spec["webhook"]] = server.slack_url(spec["name"])
+
+    # Gemini は偽のモデルに差し替える（SDKも読み込まない）
+    from sources import venue
+    venue.create_model = lambda: FakeGeminiModel(args.gemini_latency_ms / 1000)
+
+
+def summarize_metrics(snapshot):
+    """メトリクスから表示する主な値を集計する"""
+    totals = {}
+    for item in snapshot["counters"]:
+        labels = item["labels"]
+        if item["name"] == "http_requests_total":
+            key = "HTTPリクエスト" if labels.get("status") != "429" else "うち429"
+        elif item["name"] == "http_retries_total":
+            key = "リトライ"
+        elif item["name"] == "http_cache_total":
+            key = f"HTTPキャッシュ {labels['result']}"
+        elif item["name"] == "llm_requests_total":
+            key = f"Gemini呼び出し ({labels['kind']})"
+        elif item["name"] == "llm_tokens_total":
+            key = "Geminiトークン"
+        elif item["name"] == "congestion_model_total":
+            key = f"混雑予測 {labels['result']}"
+        elif item["name"] == "slack_messages_total":
+            key = f"Slack {labels['result']}"
+        else:
+            continue
+        totals[key] = totals.get(key, 0) + item["value"]
+    if "うち429" in totals:
+        totals["HTTPリクエスト"] = totals.get("HTTPリクエスト", 0) + totals["うち429"]
+    return totals
+
+
+def run_once(label, verbose):
+    import main
+    from sources.metrics import get_metrics
+
+    get_metrics().reset()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if verbose else output):
+        t0 = time.perf_counter()
+        runs = main.main()
+        total = time.perf_counter() - t0
+
+    events = sum(run.event_count for run in runs)
+    print(f"\n[{label}] main(): {total:.2f} s  ({events}件, {events / total:.0f}件/秒)")
+    for run in sorted(runs, key=lambda r: r.elapsed, reverse=True):
+        stages = ", ".join(f"{stage}={sec:.2f}s" for stage, sec in run.timings.items())
+        print(f"  {run.name:10s} {run.elapsed:7.2f} s [{run.status}] {run.event_count}件  {stages}")
+
+    snapshot = get_metrics().snapshot()
+    by_stage = {}
+    for item in snapshot["timers"]:
+        if item["name"] == "stage_seconds" and item["labels"]["stage"] not in ("fetch", "create_message", "send_notification"):
+            by_stage[(item["labels"]["source"], item["labels"]["stage"])] = item
+    for (source, stage), item in sorted(by_stage.items()):
+        print(f"    {source:10s} {stage:12s} 合計 {item['sum']:7.2f} s / {item['count']}回 (最大 {item['max'] * 1000:.0f} ms)")
+    print("  " + ", ".join(f"{key}: {value}" for key, value in summarize_metrics(snapshot).items()))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connpass-events", type=int, default=10000, help="connpass のスタブが返すイベント数")
+    parser.add_argument("--arena-months", type=int, default=12, help="会場のスケジュールの取得月数")
+    parser.add_argument("--venues", type=int, default=0, help="追加する会場の数（VenueSource でまとめて取得）")
+    parser.add_argument("--subscribers", type=int, default=0, help="connpass の購読者の数")
+    parser.add_argument("--latency-ms", type=float, default=20, help="スタブサーバーの応答遅延")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.02, help="429 を返す割合")
+    parser.add_argument("--gemini-latency-ms", type=float, default=500, help="偽の Gemini の応答時間")
+    parser.add_argument("--requests-per-second", type=float, default=0, help="connpass のレート制限（0で無制限）")
+    parser.add_argument("--slack-interval", type=float, default=0, help="同じ Webhook への送信間隔（秒）")
+    parser.add_argument("--runs", type=int, default=2, help="実行回数（2回目以降はキャッシュあり）")
+    parser.add_argument("--max-seconds", type=float, default=None, help="1回目の main() の上限（秒）")
+    parser.add_argument("--verbose", action="store_true", help="main() のログを表示する")
+    args = parser.parse_args()
+
+    server = StubServer(
+        keywords=config.TECH_CONFIG["KEYWORDS"],
+        connpass_events=args.connpass_events,
+        days_ahead=config.TECH_CONFIG["DAYS_AHEAD"],
+        latency_ms=args.latency_ms,
+        rate_limit_ratio=args.rate_limit_ratio,
+    ).start()
+
+    print("=" * 60)
+    print("オフライン end-to-end ベンチマーク")
+    print(
+        f"connpass {args.connpass_events}件, 横浜アリーナ＋{args.venues}会場 {args.arena_months}か月, "
+        f"遅延 {args.latency_ms:.0f} ms, 429 {args.rate_limit_ratio:.0%}, Gemini {args.gemini_latency_ms:.0f} ms"
+    )
+    print("=" * 60)
+
+    first = None
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-offline-") as state_dir:
+            configure(server, state_dir, args)
+            for i in range(args.runs):
+                server.reset_stats()
+                total = run_once("キャッシュなし" if i == 0 else f"{i + 1}回目（キャッシュあり）", args.verbose)
+                first = total if first is None else first
+                print("  スタブ: " + ", ".join(f"{key}={value}" for key, value in sorted(server.stats.items())))
+    finally:
+        server.stop()
+
+    if args.max_seconds is not None and first is not None and first > args.max_seconds:
+        print(f"\n❌ main() が上限を超えました: {first:.2f} s > {args.max_seconds:.2f} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+購読者への振り分け（sources/subscriptions.py）のベンチマーク
+benchmarks/fixtures/connpass_events.json を元にしたイベントを、購読者の数を変えて振り分け、
+購読者ごとに条件を順に確かめる素朴な実装と所要時間・結果を比較します。
+「照合のみ」はイベントごとに受け取る購読者のビットマスクを求めるまでの時間で、
+振り分け全体との差は受け取る購読者の数（出力の件数）に比例する部分です。
+
+    python benchmarks/bench_subscriptions.py [イベント数]
+"""
+
+import json
+import sys
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config  # noqa: E402
+from sources.base import Event, JST  # noqa: E402
+from sources.subscriptions import SubscriptionIndex  # noqa: E402
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+WORDS = config.TECH_CONFIG["KEYWORDS"] + ["Rust", "LLM", "MLOps", "pandas", "Polars", "LT", "もくもく", "横浜", "コンペ", "解法"]
+LOCATIONS = ["東京都", "神奈川県", "オンライン", "横浜", "渋谷"]
+
+
+def build_events(count):
+    templates = json.loads((FIXTURE_DIR / "connpass_events.json").read_text(encoding="utf-8"))["events"]
+    today = datetime.now(JST).replace(hour=0, minute=0, second=0, microsecond=0)
+    events = []
+    for i in range(count):
+        t = templates[i % len(templates)]
+        events.append(Event(
+            source="connpass", event_id=i, title=f"{t['title']} #{i}",
+            started_at=today + timedelta(days=1 + i % 30, hours=10 + i % 10),
+            place=t.get("place"), address=t.get("address"), summary=t.get("catch") or "",
+        ))
+    return events
+
+
+def build_subscribers(count):
+    return [
+        {
+            "name": f"team{i}",
+            "keywords": [WORDS[(i * 7 + k) % len(WORDS)] for k in range(1 + i % 4)],
+            "exclude_keywords": [WORDS[(i * 3) % len(WORDS)]] if i % 5 == 0 else [],
+            "locations": [LOCATIONS[(i + k) % len(LOCATIONS)] for k in range(1 + i % 2)],
+            "days_ahead": 7 + i % 24,
+        }
+        for i in range(count)
+    ]
+
+
+def naive_route(subscribers, events, today):
+    """購読者ごとに全イベントの条件を確かめる実装（比較用）"""
+    norm = lambda text: unicodedata.normalize("NFKC", text or "").lower()  # noqa: E731
+    routes = {}
+    for ev in events:
+        text = norm(f"{ev.title}\n{ev.summary}")
+        place = norm(f"{ev.place or ''}\n{ev.address or ''}")
+        days = max(0, (ev.date - today).days)
+        for sub in subscribers:
+            if (
+                any(norm(k) in text for k in sub["keywords"])
+                and not any(norm(k) in text for k in sub["exclude_keywords"])
+                and any(norm(loc) in place for loc in sub["locations"])
+                and days <= sub["days_ahead"]
+            ):
+                routes.setdefault(sub["name"], []).append(ev)
+    return routes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    events = build_events(count)
+    today = datetime.now(JST).date()
+
+    print("=" * 60)
+    print(f"購読者への振り分けベンチマーク（イベント {count}件）")
+    print("=" * 60)
+    for n in (10, 100, 300, 1000):
+        subscribers = build_subscribers(n)
+        t0 = time.perf_counter()
+        index = SubscriptionIndex(subscribers)
+        build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for ev in events:
+            index.match(ev, today)
+        matched = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        routes = index.route(events, today)
+        indexed = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        expected = naive_route(subscribers, events, today)
+        naive = time.perf_counter() - t0
+        routed = sum(len(evs) for evs in routes.values())
+        same = {k: [ev.event_id for ev in v] for k, v in routes.items()} == {
+            k: [ev.event_id for ev in v] for k, v in expected.items()
+        }
+        print(
+            f"\n購読者 {n:4d}人: 索引 {indexed * 1000:7.1f} ms ({indexed / count * 1e6:5.1f} µs/件, 構築 {build * 1000:.1f} ms)"
+            f" / 素朴な実装 {naive * 1000:8.1f} ms ({naive / indexed:.1f}x)"
+        )
+        print(f"  照合のみ {matched / count * 1e6:5.1f} µs/件, 振り分け {routed}件, 素朴な実装と結果が一致: {'✓' if same else '✗'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+横浜アリーナのカレンダー表パースのベンチマーク
+保存済みのページ（benchmarks/fixtures/yokoari_*.html または引数で指定したファイル）を使い、
+旧実装（BeautifulSoup + html.parser でページ全体をパース）と現行実装（全会場共通の
+sources.venue.parse_venue_page に config.VENUES["yokohama_arena"] を渡したもの）の速度を比較します。
+
+    python benchmarks/bench_yokoari_parse.py [保存したHTML ...]
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sources import venue  # noqa: E402
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+REPEAT = 5
+
+
+def legacy_parse(html):
+    """変更前の _parse_table_from_html（比較用）"""
+    soup = BeautifulSoup(html, "html.parser")
+    table = soup.find("table", id="calbox")
+    if not table:
+        return []
+
+    rows = table.find_all("tr")
+    data_rows = []
+    for tr in rows[1:]:
+        cols = [td.get_text(strip=True) for td in tr.find_all(["td", "th"])]
+        if not cols or len(cols) < 2:
+            continue
+        data_rows.append({
+            "title": cols[1] if len(cols) > 1 else "",
+            "date": cols[0] if len(cols) > 0 else "",
+            "open": cols[2] if len(cols) > 2 else "",
+            "start": cols[3] if len(cols) > 3 else "",
+            "end": cols[4] if len(cols) > 4 else "",
+        })
+    return data_rows
+
+
+VENUE = venue.load_venue("yokohama_arena")
+PAGE_URL = VENUE["url_template"].format(year=2026, month=10)
+
+
+def current_parse(html):
+    return venue.parse_venue_page(html, VENUE, PAGE_URL)
+
+
+def bs4_fallback_parse(html):
+    """lxml がない環境での現行実装"""
+    original = venue._rows_lxml
+
+    def no_lxml(_html, _venue):
+        raise ImportError("lxml disabled for benchmark")
+
+    venue._rows_lxml = no_lxml
+    try:
+        return current_parse(html)
+    finally:
+        venue._rows_lxml = original
+
+
+def best_ms(func, html, number):
+    return min(timeit.repeat(lambda: func(html), number=number, repeat=REPEAT)) / number * 1000
+
+
+def main():
+    paths = [Path(p) for p in sys.argv[1:]] or sorted(FIXTURE_DIR.glob("yokoari_*.html"))
+    if not paths:
+        print(f"ベンチマーク用のページがありません: {FIXTURE_DIR}")
+        return 1
+
+    print("=" * 60)
+    print("横浜アリーナ カレンダー表パース ベンチマーク")
+    print("=" * 60)
+
+    for path in paths:
+        html = path.read_text(encoding="utf-8")
+        legacy = legacy_parse(html)
+        current = current_parse(html)
+        fields = ("title", "date", "open", "start", "end")
+        same = [{k: ev[k] for k in fields} for ev in current] == legacy
+        with_url = sum(1 for ev in current if ev["event_url"])
+
+        number = 20
+        legacy_ms = best_ms(legacy_parse, html, number)
+        current_ms = best_ms(current_parse, html, number)
+        fallback_ms = best_ms(bs4_fallback_parse, html, number)
+
+        print(f"\n{path.name} ({len(html) / 1024:.1f}KB, {len(current)}件, URLあり {with_url}件)")
+        print(f"  旧実装 (html.parser 全体)     : {legacy_ms:8.2f} ms")
+        print(f"  現行 (lxml + 表の切り出し)     : {current_ms:8.2f} ms  ({legacy_ms / current_ms:.1f}x)")
+        print(f"  現行 (lxmlなし, SoupStrainer) : {fallback_ms:8.2f} ms  ({legacy_ms / fallback_ms:.1f}x)")
+        print(f"  旧実装と結果が一致: {'✓' if same else '✗'}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+オフラインベンチマーク用のローカルスタブサーバー
+
+connpass API・会場（横浜アリーナなど）のスケジュールページ・Slack Incoming Webhook の代わりに応答する。
+応答の元になるのは benchmarks/fixtures の記録済みデータで、件数を増やして返す。
+
+    server = StubServer(keywords=config.TECH_CONFIG["KEYWORDS"], connpass_events=10000)
+    server.start()
+    server.connpass_url      # config.TECH_CONFIG["API_URL"] に設定する
+    server.arena_url         # config.VENUES["yokohama_arena"]["url_template"] の {year}-{month:02d} の前に設定する
+    server.venue_url("hall") # 横浜アリーナと同じ形式のページを返す別の会場
+    server.slack_url("tech") # Webhook の環境変数に設定する
+
+latency_ms で全リクエストに遅延を入れ、rate_limit_ratio の割合で 429（Retry-After 付き）を返す。
+connpass のイベントのうち duplicate_ratio の割合は、別グループによるオンライン版の重複掲載も返す。
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+JST = timezone(timedelta(hours=9))
+
+ARTISTS = ["LUMINOUS", "青空シグナル", "NEON PARADE", "ミッドナイト急行", "Starlit Nine", "潮騒バンド"]
+SHOWS = ["ワールドツアー横浜公演", "LIVE TOUR 2026", "ファンミーティング", "アリーナツアー", "感謝祭"]
+
+
+class StubServer:
+    def __init__(self, keywords, connpass_events=1000, days_ahead=31, arena_events_per_day=1,
+                 latency_ms=0, rate_limit_ratio=0.0, retry_after=0.2, duplicate_ratio=0.05, seed=0):
+        self.keywords = list(keywords)
+        self.latency = latency_ms / 1000
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.arena_events_per_day = arena_events_per_day
+        self.duplicate_ratio = duplicate_ratio
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._events_by_keyword = self._build_connpass_events(connpass_events, days_ahead)
+        self._arena_template = (FIXTURE_DIR / "yokoari_2026-10.html").read_text(encoding="utf-8")
+        self._server = None
+
+    # --- 記録済みデータを元にした応答の生成 ---
+
+    def _build_connpass_events(self, count, days_ahead):
+        """記録済みのイベントを雛形に count 件作り、キーワードごとに振り分ける（1割は2つのキーワードに該当）"""
+        templates = json.loads((FIXTURE_DIR / "connpass_events.json").read_text(encoding="utf-8"))["events"]
+        today = datetime.now(JST).replace(hour=0, minute=0, second=0, microsecond=0)
+        by_keyword = {keyword: [] for keyword in self.keywords}
+        for i in range(count):
+            ev = dict(templates[i % len(templates)])
+            started_at = today + timedelta(days=1 + i % max(1, days_ahead - 1), hours=10 + i % 10)
+            ev.update({
+                "id": 1_000_000 + i,
+                "title": f"{ev['title']} #{i}",
+                "url": f"https://example.connpass.com/event/{1_000_000 + i}/",
+                "started_at": started_at.isoformat(),
+                "ended_at": (started_at + timedelta(hours=2)).isoformat(),
+                "accepted": (ev["accepted"] + i) % ((ev["limit"] or 100) + 1),
+            })
+            keyword = self.keywords[i % len(self.keywords)]
+            by_keyword[keyword].append(ev)
+            if self.duplicate_ratio and i % round(1 / self.duplicate_ratio) == 0:
+                by_keyword[keyword].append(dict(
+                    ev,
+                    id=3_000_000 + i,
+                    title=f"【オンライン】{ev['title']}",
+                    url=f"https://example-online.connpass.com/event/{3_000_000 + i}/",
+                    owner_display_name=f"{ev['owner_display_name']} オンライン",
+                ))
+            if i % 10 == 0 and len(self.keywords) > 1:
+                by_keyword[self.keywords[(i + 1) % len(self.keywords)]].append(ev)
+        return by_keyword
+
+    def _connpass_response(self, query):
+        keyword = query.get("keyword", [""])[0]
+        events = self._events_by_keyword.get(keyword, [])
+        if "ymd" in query:
+            days = set(query["ymd"][0].split(","))
+            events = [ev for ev in events if ev["started_at"][:10].replace("-", "") in days]
+        start = int(query.get("start", ["1"])[0])
+        count = int(query.get("count", ["10"])[0])
+        page = events[start - 1:start - 1 + count]
+        return {
+            "results_returned": len(page),
+            "results_available": len(events),
+            "results_start": start,
+            "events": page,
+        }
+
+    def _arena_page(self, year, month, venue=""):
+        """記録済みのページの表の中身を、指定した月のイベントに差し替えて返す（会場ごとに出演者をずらす）"""
+        rows = []
+        day = date(year, month, 1)
+        n = sum(venue.encode("utf-8")) % len(ARTISTS)
+        while day.month == month:
+            for _ in range(self.arena_events_per_day):
+                hour = 13 + n % 6
+                rows.append(
+                    "        <tr>\n"
+                    f"          <td class=\"date\">{day.day}({'月火水木金土日'[day.weekday()]})</td>\n"
+                    f"          <td class=\"title\"><a href=\"/event/detail/{year}{month:02d}{n:03d}/\">"
+                    f"<span class=\"artist\">{ARTISTS[n % len(ARTISTS)]}</span> {SHOWS[n % len(SHOWS)]}</a></td>\n"
+                    f"          <td class=\"open\">{hour - 1}:00</td>\n"
+                    f"          <td class=\"start\">{hour}:00</td>\n"
+                    f"          <td class=\"end\">{hour + 2}:30</td>\n"
+                    "          <td class=\"contact\">サンプルプロモーション<br>045-000-0000</td>\n"
+                    "        </tr>"
+                )
+                n += 1
+            day += timedelta(days=1)
+        head, rest = self._arena_template.split("<tbody>", 1)
+        _, tail = rest.split("</tbody>", 1)
+        return f"{head}<tbody>\n" + "\n".join(rows) + f"\n      </tbody>{tail}"
+
+    # --- サーバー ---
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def connpass_url(self):
+        return f"{self.base_url}/connpass/api/v2/events/"
+
+    @property
+    def arena_url(self):
+        return f"{self.base_url}/arena/event/"
+
+    def venue_url(self, name):
+        return f"{self.base_url}/arena/{name}/event/"
+
+    def slack_url(self, name):
+        return f"{self.base_url}/slack/{name}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b"", content_type="text/plain; charset=utf-8", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _throttled(self, route):
+                time.sleep(server.latency)
+                with server._random_lock:
+                    limited = server._random.random() < server.rate_limit_ratio
+                if limited:
+                    server._count(route, 429)
+                    self._send(429, b"rate limited", headers={"Retry-After": str(server.retry_after)})
+                return limited
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path.startswith("/connpass/"):
+                    if self._throttled("connpass"):
+                        return
+                    body = json.dumps(server._connpass_response(parse_qs(url.query)), ensure_ascii=False).encode("utf-8")
+                    server._count("connpass", 200, len(body))
+                    self._send(200, body, "application/json; charset=utf-8")
+                    return
+                m = re.match(r"/arena/(?:([\w-]+)/)?event/(\d{4})-(\d{2})$", url.path)
+                if m:
+                    if self._throttled("arena"):
+                        return
+                    body = server._arena_page(int(m.group(2)), int(m.group(3)), m.group(1) or "").encode("utf-8")
+                    server._count("arena", 200, len(body))
+                    self._send(200, body, "text/html; charset=utf-8")
+                    return
+                self._send(404, b"not found")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if not self.path.startswith("/slack/"):
+                    self._send(404, b"not found")
+                    return
+                if self._throttled("slack"):
+                    return
+                blocks = len(json.loads(body).get("blocks", []))
+                server._count("slack", 200, len(body))
+                with server._stats_lock:
+                    server.stats["slack blocks"] += blocks
+                self._send(200, b"ok")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _count(self, route, status, nbytes=0):
+        with self._stats_lock:
+            self.stats[f"{route} {status}"] += 1
+            self.stats[f"{route} bytes"] += nbytes
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats.clear()
@@ -2,16 +2,16 @@ import os
 from pathlib import Path
 
 # .envファイルを読み込む（ローカル開発用）
-try:
-    from dotenv import load_dotenv
-    env_path = Path(__file__).parent / '.env'
-    if env_path.exists():
+# .envファイルが存在しない場合は環境変数のみを使用（python-dotenvもインポートしない）
+env_path = Path(__file__).parent / '.env'
+if env_path.exists():
+    try:
+        from dotenv import load_dotenv
         load_dotenv(env_path, override=True)  # override=Trueで環境変数を上書き
-    # .envファイルが存在しない場合は環境変数のみを使用
-except ImportError:
-    # python-dotenvがインストールされていない場合はスキップ
-    # 環境変数のみを使用
-    pass
+    except ImportError:
+        # python-dotenvがインストールされていない場合はスキップ
+        # 環境変数のみを使用
+        pass
 
 # --- Slack Webhook URLs ---
 SLACK_WEBHOOK_TECH = os.environ.get("SLACK_WEBHOOK_TECH")
@@ -23,12 +23,249 @@ CONNPASS_API_KEY = os.environ.get("CONNPASS_API_KEY")
 
 # --- データ系勉強会の設定 ---
 TECH_CONFIG = {
+    "API_URL": "https://connpass.com/api/v2/events/",  # v2エンドポイント（eventsは複数形）
     "KEYWORDS": ["データ分析", "機械学習", "Deep Learning", "Kaggle", "SQL", "Python", "生成AI"],
     "LOCATIONS": ["東京都", "オンライン", "神奈川県"],
     "DAYS_AHEAD": 31,
+    # LOCATIONS の表記 -> connpass API の prefecture パラメータ値
+    "PREFECTURES": {"東京都": "tokyo", "神奈川県": "kanagawa", "オンライン": "online"},
+    "PAGE_SIZE": 100,           # 1リクエストあたりの取得件数（APIの上限は100）
+    "MAX_PAGES": 5,             # キーワードごとに辿る最大ページ数
+    "MAX_WORKERS": 4,           # 同時に投げるリクエスト数
+    "REQUESTS_PER_SECOND": 1,   # connpass API のレート制限（全リクエスト共通）
+    "YMD_MAX_DAYS": 62,         # 期間がこの日数以内なら ymd（日単位）、超えたら ym（月単位）でAPIに絞り込みを渡す
+    "CACHE_TTL_SECONDS": 600,   # 同じ検索条件の結果をこの秒数は再取得しない
+    "NOTIFY_ONLY_CHANGES": True,  # 前回通知から新規・変更があったイベントだけを通知する
+    "TOP_N": 20,                # 関連度の高い順にこの件数だけ通知する（None なら全件）
+    # 関連度スコアの重み（sources/ranking.py）。KEYWORD はキーワードごとの一致度の合計、
+    # LOCATION は LOCATIONS に含まれる開催地、DATE は開催日の近さ、FILL は申込率、FULL は満席のとき
+    "RANKING_WEIGHTS": {"KEYWORD": 3.0, "LOCATION": 1.0, "DATE": 1.0, "FILL": 0.5, "FULL": -1.0},
+    # 同じ勉強会の重複掲載（グループごと・オンライン/現地ごと・再掲載）を1件にまとめる（sources/dedup.py）。
+    # タイトルの類似度（3-gram の Jaccard 係数）が SIMILARITY 以上（主催者が違えば SIMILARITY_OTHER_OWNER 以上）で、
+    # 開催日とタイトル中の数字が同じ、開始時刻の差が MAX_START_DIFF_MINUTES 分以内なら重複とみなす
+    "DEDUP": {
+        "ENABLED": True,
+        "SIMILARITY": 0.6,
+        "SIMILARITY_OTHER_OWNER": 0.8,
+        # 主催者が違う掲載は、会場（オンライン以外）が同じか、タイトル（正規化後）がこの文字数以上のときだけまとめる
+        "MIN_TITLE_LENGTH_OTHER_OWNER": 15,
+        "MAX_START_DIFF_MINUTES": 30,
+        "IGNORE_WORDS": ["オンライン", "オフライン", "現地参加", "現地", "配信", "ハイブリッド", "会場参加",
+                         "再掲", "再投稿", "追加募集", "online", "offline", "hybrid"],
+    },
+    "STATE_PATH": str(Path(__file__).parent / ".cache" / "events.sqlite3"),
 }
 
-# --- 横浜アリーナの設定 ---
+# --- 会場のスケジュールページの設定（sources/venue.py） ---
+# 会場を増やすときは VENUES に1件足し、ソースの options の "VENUES" に登録名を加える（コードの変更は不要）。
+# name             : 通知や混雑予測に使う会場名
+# station          : 混雑を予測する最寄り駅（Gemini への指示に使う）
+# url_template     : 月ごとのスケジュールページのURL（{year}, {month} を埋める）
+# row_xpath        : イベント1件に当たる要素（表の行など）の XPath
+# skip_rows        : row_xpath で見つかった要素のうち、先頭の見出し行として読み飛ばす数
+# columns          : 項目（date / title / open / start / end）ごとの取り出し方。
+#                    数値なら行の中の td/th の位置、文字列なら行からの相対 XPath。title のない行は除外する
+# link_xpath       : 詳細ページへのリンクを取り出す相対 XPath
+# table_id         : イベントの表の id。指定するとパース前にHTMLからその表だけを切り出す（高速化）
+# date_pattern     : date の文字列から日付を読む正規表現（名前付きグループ day と、省略可の month / year）。
+#                    月がなければページの月とみなす
+# render           : "never"（取得したHTMLだけを使う）, "fallback"（行がなければブラウザで描画する）, "always"
+# wait_selector    : ブラウザで描画するときに現れるのを待つ CSS セレクタ
+# cache_ttl_seconds: ページのキャッシュの保持秒数
+VENUE_DEFAULTS = {
+    "station": None,
+    "skip_rows": 0,
+    "link_xpath": ".//a/@href",
+    "table_id": None,
+    "date_pattern": r"(?:(?P<month>\d{1,2})/)?(?P<day>\d{1,2})",
+    "render": "fallback",
+    "wait_selector": None,
+    "cache_ttl_seconds": 6 * 3600,  # スケジュールページはほとんど変わらないため長めに保持
+}
+
+VENUES = {
+    "yokohama_arena": {
+        "name": "横浜アリーナ",
+        "station": "新横浜駅",
+        "url_template": "https://www.yokohama-arena.co.jp/event/{year}-{month:02d}",
+        "row_xpath": "(//table[@id='calbox'])[1]//tr",
+        "skip_rows": 1,
+        "columns": {"date": 0, "title": 1, "open": 2, "start": 3, "end": 4},
+        "table_id": "calbox",
+        "date_pattern": r"(?:(?P<month>\d{1,2})/)?(?P<day>\d{1,2})[（(]?",  # 「7(日)」「12/7(日)」
+        "render": "fallback",
+        "wait_selector": "table#calbox",
+    },
+}
+
+# 会場のソース（type "venue"）の既定設定
+VENUE_SOURCE_CONFIG = {
+    "VENUES": None,                 # 対象の会場（VENUES の登録名のリスト）。None なら全会場
+    "LOOKAHEAD_DAYS": 7,            # 今日から何日先までのイベントを通知するか（0なら今日のみ）
+    "MAX_WORKERS": 8,               # 全会場・全月のページを取得する共有スレッドプールの大きさ
+    "HEADER": "📍 会場の予定ピックアップ",
+}
+
+# --- 横浜アリーナの設定（VENUE_SOURCE_CONFIG を上書きする） ---
 YOKOARI_CONFIG = {
-    "BASE_URL": "https://www.yokohama-arena.co.jp/event/",
+    "VENUES": ["yokohama_arena"],
+    "LOOKAHEAD_DAYS": 7,
+    "HEADER": "📍 横浜アリーナ 予定ピックアップ",
+}
+
+# --- Gemini（混雑予測）の設定 ---
+GEMINI_CONFIG = {
+    "MODEL": "gemini-2.5-flash",
+    "PROMPT_VERSION": 2,  # プロンプトを変えたら上げる（予測キャッシュが無効になる）
+    "PREDICTION_CACHE_PATH": str(Path(__file__).parent / ".cache" / "predictions.sqlite3"),
+    "PREDICTION_CACHE_TTL_DAYS": 30,
+    "PREDICTION_CACHE_MAX_ENTRIES": 2000,
+    "BATCH": True,  # その日のイベントをまとめて1回の呼び出しで予測する
+    "MAX_CONCURRENCY": 4,       # 1件ずつ予測する場合の同時呼び出し数
+    "DEADLINE_SECONDS": 60,     # 予測全体の制限時間。超えたイベントは予測なしで送信する
+}
+
+# --- 手元の混雑予測モデル（過去の Gemini の予測から似た公演の混雑を推定する） ---
+CONGESTION_MODEL_CONFIG = {
+    "ENABLED": True,
+    "HISTORY_PATH": str(Path(__file__).parent / ".cache" / "congestion_history.sqlite3"),
+    "MIN_CONFIDENCE": 0.6,      # これ未満の確信度なら Gemini に問い合わせる
+    "NEIGHBORS": 5,             # 多数決に使う似た公演の数
+    "MIN_SIMILARITY": 0.4,      # これ未満の類似度の公演は使わない
+    "MIN_NEIGHBORS": 3,         # 似た公演がこれ未満なら Gemini に問い合わせる（タイトルがほぼ同じ公演があれば別）
+    "EXACT_SIMILARITY": 0.9,    # タイトルの類似度（IDF 重み付き）がこれ以上なら同じ公演の再演とみなす
+    "MAX_HISTORY": 5000,        # 保持する履歴の件数
+}
+
+# --- 実行するソース ---
+# name    : ソースの名前（ログ・状態の保存先の区別に使うので一意にする）
+# type    : sources.SOURCE_REGISTRY の登録名
+# webhook : 通知先の Webhook URL を持つ環境変数名
+# schedule: 省略時は毎回実行。interval_minutes（前回の成功から空ける分数）,
+#           hours（実行する時刻 JST のリスト）, weekdays（実行する曜日のリスト, 0=月曜）を組み合わせられる
+# daemon_schedule: 常駐モード（python main.py --daemon）での schedule。省略時は schedule を使う
+# options : 各ソースの既定設定（TECH_CONFIG / VENUE_SOURCE_CONFIG / YOKOARI_CONFIG など）を上書きする値
+SOURCES = [
+    # データ系勉強会 -> Techチャンネル
+    {
+        "name": "connpass",
+        "type": "connpass",
+        "webhook": "SLACK_WEBHOOK_TECH",
+        "enabled": True,
+        "schedule": {},
+        "daemon_schedule": {"interval_minutes": 60},  # 常駐モードでは1時間ごと
+        "options": {},
+    },
+    # 横アリ混雑情報 -> Lifeチャンネル
+    {
+        "name": "yokoari",
+        "type": "yokoari",
+        "webhook": "SLACK_WEBHOOK_LIFE",
+        "enabled": True,
+        "schedule": {},
+        "daemon_schedule": {"hours": [8], "interval_minutes": 23 * 60},  # 常駐モードでは毎朝8時台に1回
+        "options": {},
+    },
+]
+
+# --- 購読者（チームごとの通知先と条件。sources/subscriptions.py） ---
+# ソースが取得したイベントのうち条件に合うものを、購読者ごとの Webhook に別のメッセージとして送る。
+# name            : 購読者の名前（一意にする。通知済みの記録の区別に使う）
+# source          : 対象のソースの name（config.SOURCES）
+# webhook         : 通知先の Webhook URL を持つ環境変数名
+# keywords        : タイトル・説明文にいずれかを含むイベントを受け取る（省略時はソースの KEYWORDS）
+# exclude_keywords: タイトル・説明文に含むイベントは受け取らない
+# locations       : 開催場所・住所にいずれかを含むイベントを受け取る（省略時はソースの LOCATIONS）
+# days_ahead      : 今日から何日後までのイベントを受け取るか（省略時はソースの DAYS_AHEAD。それより先は取得されない）
+# top_n / header  : 1回の通知の件数の上限とメッセージの見出し（省略時はソースの設定）
+# ソースの KEYWORDS / LOCATIONS にないキーワード・開催地は、ソースが追加で検索する。
+SUBSCRIBERS = [
+    # {
+    #     "name": "ml-team",
+    #     "source": "connpass",
+    #     "webhook": "SLACK_WEBHOOK_ML",
+    #     "keywords": ["機械学習", "LLM", "MLOps"],
+    #     "exclude_keywords": ["初心者向け"],
+    #     "locations": ["東京都", "オンライン"],
+    #     "days_ahead": 14,
+    # },
+]
+
+# 環境変数 ENABLED_SOURCES（カンマ区切りの name）を指定すると、その中のソースだけを実行する
+ENABLED_SOURCES = [
+    name.strip() for name in os.environ.get("ENABLED_SOURCES", "").split(",") if name.strip()
+] or None
+
+# ソースごとの前回実行時刻（schedule の判定に使う）
+SCHEDULE_STATE_PATH = str(Path(__file__).parent / ".cache" / "schedule.json")
+
+# --- 常駐モード（python main.py --daemon）の設定 ---
+DAEMON_CONFIG = {
+    "POLL_SECONDS": 60,                 # 実行時刻になったソースがないか確認する間隔
+    "DEFAULT_INTERVAL_MINUTES": 60,     # daemon_schedule / schedule に間隔の指定がないソースの実行間隔
+    "ERROR_RETRY_MINUTES": 15,          # 失敗・タイムアウトしたソースを再実行するまでの待ち時間
+    "SHUTDOWN_TIMEOUT": 120,            # 終了時に実行中のソースを待つ上限（秒）
+}
+
+# --- 実行エンジンの設定 ---
+RUNNER_CONFIG = {
+    "MAX_WORKERS": 4,           # 同時に実行するソース数の上限
+    "SOURCE_TIMEOUT": 600,      # 1ソースあたりの制限時間（秒。開始してから数える）。超過したソースは待たずに打ち切り、枠を返す
+}
+
+# --- 計測値（ステージごとの所要時間・転送量・リトライ・キャッシュ・LLMのトークン数など）の出力 ---
+METRICS_CONFIG = {
+    "ENABLED": True,
+    "DIR": str(Path(__file__).parent / "metrics"),     # 実行ごとに metrics-<日時>.json を書き出す
+    "PROMETHEUS": os.getenv("METRICS_PROMETHEUS", "") == "1",  # Prometheus のテキスト形式（.prom）も書き出す
+}
+
+# --- HTTPキャッシュの設定（全ソース共通） ---
+HTTP_CACHE_CONFIG = {
+    "DIR": str(Path(__file__).parent / ".cache" / "http"),
+    "TTL_SECONDS": 3600,                # この秒数以内はネットワークに出ずキャッシュを返す
+    "MAX_BYTES": 50 * 1024 * 1024,      # キャッシュ全体の上限。超えたら古いものから削除
+}
+
+# --- HTTP通信の設定（全ソース共通のセッション・リトライ） ---
+HTTP_CONFIG = {
+    "POOL_CONNECTIONS": 10,     # コネクションプールを保持するホスト数
+    "POOL_MAXSIZE": 10,         # 1ホストあたりのプールサイズ
+    "MAX_PER_HOST": 4,          # 1ホストへの同時リクエスト数の上限
+    "MAX_RETRIES": 3,           # 429 / 5xx / 接続エラー時のリトライ回数
+    "BACKOFF_BASE": 1.0,        # 指数バックオフの基準秒数（1, 2, 4, ... 秒を上限にジッター）
+    "BACKOFF_MAX": 30.0,        # バックオフ1回あたりの上限秒数
+    "RETRY_AFTER_MAX": 120.0,   # Retry-After に従って待つ上限秒数
+}
+
+# --- Slack への送信設定 ---
+SLACK_CONFIG = {
+    "MAX_BLOCKS": 50,               # 1メッセージのブロック数の上限（超える分は複数メッセージに分割）
+    "MAX_TEXT_CHARS": 3000,         # section ブロック1つの文字数の上限
+    "MAX_HEADER_CHARS": 150,        # header ブロックの文字数の上限
+    "MIN_INTERVAL_SECONDS": 1.0,    # 同じ Webhook へ連続で送るときの間隔
+    "TIMEOUT": 10,
+}
+
+# --- 送信前のメッセージを保存するアウトボックス（送れなかった通知は次回の実行で再送） ---
+OUTBOX_CONFIG = {
+    "ENABLED": True,
+    "PATH": str(Path(__file__).parent / ".cache" / "outbox.sqlite3"),
+    "DEDUP_SECONDS": 6 * 3600,          # 同じ内容のメッセージを送信済みとして扱う期間
+    "MAX_AGE_SECONDS": 3 * 24 * 3600,   # これより古い未送信メッセージは再送せずに破棄
+}
+
+# --- ヘッドレスブラウザ（JS描画ページ用）の設定 ---
+RENDERER_CONFIG = {
+    "TIMEOUT_MS": 15000,
+    # 描画に不要なため読み込まないリソース
+    "BLOCKED_RESOURCE_TYPES": ["image", "font", "stylesheet", "media"],
+    "BLOCKED_HOSTS": [
+        "google-analytics.com",
+        "googletagmanager.com",
+        "doubleclick.net",
+        "googlesyndication.com",
+        "facebook.net",
+        "twitter.com",
+    ],
 }
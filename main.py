@@ -1,68 +1,335 @@
-import warnings
+import argparse
+import signal
 import sys
-import os
+import warnings
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
 
 # importlib.metadataのエラーを抑制（Python 3.9の互換性問題）
 warnings.filterwarnings('ignore', category=DeprecationWarning)
 warnings.filterwarnings('ignore', message='.*importlib.metadata.*')
 
-# google-generativeaiのインポート時のエラーメッセージを抑制
-# エラーメッセージはprintで出力されるため、stdout/stderrを一時的にリダイレクト
-class SuppressOutput:
-    def __init__(self):
-        self.stdout = sys.stdout
-        self.stderr = sys.stderr
-        
-    def __enter__(self):
-        sys.stdout = open(os.devnull, 'w')
-        sys.stderr = open(os.devnull, 'w')
-        return self
-        
-    def __exit__(self, *args):
-        sys.stdout.close()
-        sys.stderr.close()
-        sys.stdout = self.stdout
-        sys.stderr = self.stderr
-
-# google-generativeaiのインポート時のエラーを抑制
-with SuppressOutput():
-    try:
-        import google.generativeai as genai
-    except:
-        pass
-
 import config
-from sources.connpass import ConnpassSource
-from sources.yokoari import YokoariSource
+from scheduler import JST, ScheduleState, select_sources
+from sources import create_source, resolve_webhook
+from sources.metrics import get_metrics
 
-def main():
-    print("--- Batch Start ---")
-    
-    # 実行するソースのリスト
-    sources = [
-        # データ系勉強会 -> Techチャンネル
-        ConnpassSource(webhook_url=config.SLACK_WEBHOOK_TECH),
-        
-        # 横アリ混雑情報 -> Lifeチャンネル
-        YokoariSource(webhook_url=config.SLACK_WEBHOOK_LIFE)
-    ]
-
-    for source in sources:
+class SourceRun:
+    """1ソース分のパイプライン（fetch → create_message → send_notification）の実行状態"""
+
+    def __init__(self, source):
+        self.source = source
+        self.name = source.name
+        self._status = "pending"  # pending / running / ok / empty / error
+        self.timed_out = False
+        self.error = None
+        self.event_count = 0
+        self.timings = {}  # ステージ名 -> 秒
+        self.scheduled_at = None  # schedule の判定に使った時刻（実行が成功したら前回実行時刻になる）
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+        self._slots = None
+        self._holding_slot = False
+        self._lock = threading.Lock()  # timed_out と枠の返却を実行スレッドと監視側で揃える
+
+    @property
+    def status(self):
+        # 打ち切り後にスレッドが遅れて終了しても timeout のまま扱う
+        return "timeout" if self.timed_out else self._status
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    def _stage(self, stage, func, *args):
+        t0 = time.perf_counter()
         try:
-            print(f"Processing {source.__class__.__name__}...")
-            events = source.fetch_events()
-            
+            return func(*args)
+        finally:
+            self.timings[stage] = time.perf_counter() - t0
+            get_metrics().observe("stage_seconds", self.timings[stage], source=self.name, stage=stage)
+
+    def run(self, slots):
+        slots.acquire()
+        with self._lock:
+            self._slots = slots
+            self._holding_slot = True
+            self.started_at = time.perf_counter()
+        self._status = "running"
+        try:
+            print(f"Processing {self.name}...")
+            events = self._stage("fetch", self.source.fetch_events)
+
             if events:
-                print(f"  -> Found {len(events)} events.")
-                payload = source.create_message(events)
-                source.send_notification(payload)
+                self.event_count = len(events)
+                print(f"  -> [{self.name}] Found {len(events)} events.")
+                payload = self._stage("create_message", self.source.create_message, events)
+                self._stage("send_notification", self.source.send_notification, payload)
+                self._status = "ok"
             else:
-                print("  -> No events found.")
-                
+                print(f"  -> [{self.name}] No events found.")
+                self._status = "empty"
+
         except Exception as e:
-            print(f"Error in {source.__class__.__name__}: {e}")
-            
+            self._status = "error"
+            self.error = e
+            print(f"Error in {self.name}: {e}")
+        finally:
+            with self._lock:
+                self._release_slot()
+            if not self.timed_out:
+                self.finished_at = time.perf_counter()
+            self.done.set()
+
+    def abandon(self):
+        """打ち切ったことにして枠を返す（スレッド自体は止められないので、終わるまで動き続ける）"""
+        with self._lock:
+            self.timed_out = True
+            self.finished_at = time.perf_counter()
+            self._release_slot()
+
+    def _release_slot(self):
+        if self._holding_slot:
+            self._holding_slot = False
+            self._slots.release()
+
+
+def run_sources(sources, max_workers=None, timeout=None):
+    """
+    ソースごとのパイプラインを並行実行する。
+
+    各ソースは独立したデーモンスレッドで動くため、1つのソースが例外で落ちたり
+    制限時間を超えたりしても他のソースの処理は止まらない。
+    制限時間（枠を得て開始してから数える）を超えたソースは timeout として扱い、終了を待たずに先へ進む。
+    打ち切ったソースの枠は返すので、止まったソースが MAX_WORKERS 個あっても残りのソースは始められる。
+    """
+    max_workers = max_workers or config.RUNNER_CONFIG["MAX_WORKERS"]
+    timeout = timeout or config.RUNNER_CONFIG["SOURCE_TIMEOUT"]
+
+    slots = threading.BoundedSemaphore(max_workers)
+    runs = [start_run(source, slots) for source in sources]
+
+    pending = list(runs)
+    while pending:
+        for run in list(pending):
+            if run.done.is_set() or check_timeout(run, timeout):
+                pending.remove(run)
+        if pending:
+            pending[0].done.wait(0.2)
+
+    return runs
+
+
+def start_run(source, slots):
+    """source のパイプラインをデーモンスレッドで開始し、その SourceRun を返す"""
+    run = SourceRun(source)
+    threading.Thread(target=run.run, args=(slots,), name=f"source-{run.name}", daemon=True).start()
+    return run
+
+
+def check_timeout(run, timeout):
+    """
+    制限時間を超えていれば timeout として扱い True を返す（スレッド自体は止められない）。
+
+    制限時間は枠を得て開始してから数える（枠の空き待ちは含めない）。
+    打ち切ったソースの枠はその場で返すので、待っているソースは止まったソースの後に始められる。
+    """
+    if run.timed_out:
+        return True
+    if run.started_at is not None and not run.done.is_set() and run.elapsed > timeout:
+        run.abandon()
+        print(f"Timeout in {run.name}: {timeout}秒を超えたため打ち切りました")
+        return True
+    return False
+
+
+def print_timing_report(runs, total):
+    """ソースごとの所要時間を遅い順に表示する（先頭がクリティカルパス）"""
+    print("--- Timing Report ---")
+    for run in sorted(runs, key=lambda r: r.elapsed, reverse=True):
+        stages = ", ".join(f"{stage}={sec:.2f}s" for stage, sec in run.timings.items())
+        print(f"  {run.name}: {run.elapsed:.2f}s [{run.status}] {stages}")
+    print(f"  Total: {total:.2f}s")
+
+
+def write_metrics(runs, total):
+    """今回の実行の計測値を config.METRICS_CONFIG["DIR"] に書き出す"""
+    cfg = config.METRICS_CONFIG
+    if not cfg["ENABLED"]:
+        return
+    run_info = {
+        "total_seconds": round(total, 3),
+        "sources": [
+            {
+                "name": run.name,
+                "status": run.status,
+                "events": run.event_count,
+                "elapsed_seconds": round(run.elapsed, 3),
+                "error": str(run.error) if run.error else None,
+            }
+            for run in runs
+        ],
+    }
+    try:
+        path = get_metrics().write(cfg["DIR"], run_info, prometheus=cfg["PROMETHEUS"])
+        print(f"📈 メトリクスを書き出しました: {path}")
+    except OSError as e:
+        print(f"Warning: メトリクスを書き出せませんでした: {e}")
+
+
+def replay_outbox():
+    """前回までに送れなかった通知をアウトボックスから再送する（ソースの取得や予測はやり直さない）"""
+    if not config.OUTBOX_CONFIG["ENABLED"] or not Path(config.OUTBOX_CONFIG["PATH"]).exists():
+        return
+    # 送信まわり（requests）は必要になったときだけ読み込む
+    from sources.event_store import mark_notified_state
+    from sources.slack import get_delivery
+
+    webhook_urls = [resolve_webhook(spec) for spec in config.SOURCES + config.SUBSCRIBERS]
+    # 再送できた通知のイベントは通知済みとして記録する（このあとの取得で同じイベントを二重に通知しない）
+    sent, total = get_delivery().replay(webhook_urls, on_delivered=mark_notified_state)
+    if total:
+        print(f"📮 未送信の通知を再送しました: {total}通中 {sent}通")
+
+
+def main():
+    print("--- Batch Start ---")
+    batch_start = time.perf_counter()
+
+    replay_outbox()
+    
+    # 実行するソース（config.SOURCES のうち有効で、実行時刻になっているもの）だけを作る
+    now = datetime.now(JST)
+    schedule_state = ScheduleState(config.SCHEDULE_STATE_PATH)
+    specs = select_sources(config.SOURCES, now, schedule_state, config.ENABLED_SOURCES)
+    sources = [create_source(spec) for spec in specs]
+
+    runs = run_sources(sources)
+
+    for run in runs:
+        if run.status in ("ok", "empty"):
+            schedule_state.mark_run(run.name, now)
+    schedule_state.save()
+
+    total = time.perf_counter() - batch_start
+    print_timing_report(runs, total)
+    write_metrics(runs, total)
     print("--- Batch End ---")
+    return runs
+
+def daemon_schedule(spec):
+    """
+    常駐モードでの schedule。
+
+    "daemon_schedule" があればそれを使い、なければ "schedule" を使う。
+    間隔（interval_minutes）の指定がなければ DAEMON_CONFIG の既定の間隔で実行する。
+    """
+    schedule = dict(spec.get("daemon_schedule", spec.get("schedule")) or {})
+    schedule.setdefault("interval_minutes", config.DAEMON_CONFIG["DEFAULT_INTERVAL_MINUTES"])
+    return schedule
+
+
+def run_daemon():
+    """
+    常駐モード。ソースごとの schedule に従って同じプロセスの中で繰り返し実行する。
+
+    ソースのインスタンス（Gemini のクライアントや予測キャッシュ）、HTTPセッション、
+    ヘッドレスブラウザは起動したまま使い回す。同じソースの実行が重なることはなく、
+    前回の実行が終わっていなければ次の実行時刻になっても開始しない。
+    SIGTERM / SIGINT を受けたら新しい実行を止め、実行中のものを待ってから終了する。
+    """
+    cfg = config.DAEMON_CONFIG
+    timeout = config.RUNNER_CONFIG["SOURCE_TIMEOUT"]
+    stop = threading.Event()
+
+    def request_stop(signum, _frame):
+        print(f"🛑 シグナル {signal.Signals(signum).name} を受け取りました。実行中の処理が終わりしだい終了します")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    print(f"--- Daemon Start (確認間隔 {cfg['POLL_SECONDS']}秒) ---")
+    schedule_state = ScheduleState(config.SCHEDULE_STATE_PATH)
+    slots = threading.BoundedSemaphore(config.RUNNER_CONFIG["MAX_WORKERS"])
+    sources = {}      # ソース名 -> 使い回すインスタンス
+    in_flight = {}    # ソース名 -> 実行中の SourceRun
+    failed_at = {}    # ソース名 -> 失敗した実行の開始時刻（ERROR_RETRY_MINUTES は再実行しない）
+    finished = []     # メトリクスをまだ書き出していない実行
+    busy_since = None
+
+    while not stop.is_set():
+        for name, run in list(in_flight.items()):
+            check_timeout(run, timeout)
+            if run.done.is_set():
+                del in_flight[name]
+                finished.append(run)
+                if run.status in ("ok", "empty"):
+                    schedule_state.mark_run(name, run.scheduled_at)
+                    schedule_state.save()
+                    failed_at.pop(name, None)
+                else:
+                    failed_at[name] = run.scheduled_at
+                print(f"  -> [{name}] {run.status} ({run.elapsed:.2f}s)")
+
+        # 実行中のものがなくなったら、そこまでの分の計測値を書き出す
+        if finished and not in_flight:
+            write_metrics(finished, time.perf_counter() - busy_since)
+            get_metrics().reset()
+            finished = []
+
+        now = datetime.now(JST)
+        retry_wait = timedelta(minutes=cfg["ERROR_RETRY_MINUTES"])
+        specs = [
+            dict(spec, schedule=daemon_schedule(spec))
+            for spec in config.SOURCES
+            if spec["name"] not in in_flight
+            and not (spec["name"] in failed_at and now - failed_at[spec["name"]] < retry_wait)
+        ]
+        due = select_sources(specs, now, schedule_state, config.ENABLED_SOURCES, verbose=False)
+        if due:
+            if not in_flight:
+                busy_since = time.perf_counter()
+            replay_outbox()
+            for spec in due:
+                if spec["name"] not in sources:
+                    sources[spec["name"]] = create_source(spec)
+                run = start_run(sources[spec["name"]], slots)
+                run.scheduled_at = now
+                in_flight[spec["name"]] = run
+
+        stop.wait(cfg["POLL_SECONDS"])
+
+    # 終了処理: 実行中のソースを待ち、状態と計測値を保存してブラウザを閉じる
+    deadline = time.monotonic() + cfg["SHUTDOWN_TIMEOUT"]
+    for name, run in in_flight.items():
+        if not run.done.wait(max(0.0, deadline - time.monotonic())):
+            print(f"Warning: {name} が終了しないまま停止します")
+            continue
+        finished.append(run)
+        if run.status in ("ok", "empty"):
+            schedule_state.mark_run(name, run.scheduled_at)
+    schedule_state.save()
+    if finished:
+        write_metrics(finished, time.perf_counter() - busy_since)
+    if "sources.renderer" in sys.modules:
+        sys.modules["sources.renderer"].get_renderer().close()
+    print("--- Daemon End ---")
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="イベント情報をSlackに通知する")
+    parser.add_argument(
+        "--daemon", action="store_true",
+        help="常駐してソースごとの schedule（daemon_schedule）に従って繰り返し実行する",
+    )
+    if parser.parse_args().daemon:
+        run_daemon()
+    else:
+        main()
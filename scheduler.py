@@ -0,0 +1,68 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# schedule の hours / weekdays は日本時間で判定する
+JST = timezone(timedelta(hours=9))
+
+# cron の起動が数分ずれても「前回からちょうど1日」などの間隔を満たすように見る猶予
+# （短い間隔が毎回実行にならないよう、間隔の1/10を上限にする）
+INTERVAL_GRACE = timedelta(minutes=5)
+
+
+class ScheduleState:
+    """ソース名 -> 前回正常に実行した時刻 を JSON ファイルに保存する"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+            self.last_runs = {name: datetime.fromisoformat(value) for name, value in raw.items()}
+        except (OSError, ValueError):
+            self.last_runs = {}
+
+    def last_run(self, name):
+        return self.last_runs.get(name)
+
+    def mark_run(self, name, when):
+        self.last_runs[name] = when
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(
+            json.dumps({name: when.isoformat() for name, when in self.last_runs.items()}, indent=2),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+
+
+def is_due(schedule, now, last_run):
+    """schedule（config.SOURCES の "schedule"）に照らして、now に実行すべきかを返す"""
+    schedule = schedule or {}
+    if "weekdays" in schedule and now.weekday() not in schedule["weekdays"]:
+        return False
+    if "hours" in schedule and now.hour not in schedule["hours"]:
+        return False
+    interval = schedule.get("interval_minutes")
+    if interval and last_run is not None:
+        interval = timedelta(minutes=interval)
+        return now - last_run >= interval - min(INTERVAL_GRACE, interval / 10)
+    return True
+
+
+def select_sources(specs, now, state, enabled_names=None, verbose=True):
+    """有効かつ実行時刻になっているソースの設定だけを返す（verbose なら見送ったソースを表示する）"""
+    selected = []
+    for spec in specs:
+        if not spec.get("enabled", True):
+            continue
+        if enabled_names is not None and spec["name"] not in enabled_names:
+            continue
+        if not is_due(spec.get("schedule"), now, state.last_run(spec["name"])):
+            if verbose:
+                print(f"Skipping {spec['name']}: 実行時刻ではありません (前回: {state.last_run(spec['name'])})")
+            continue
+        selected.append(spec)
+    return selected
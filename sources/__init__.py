@@ -1 +1,31 @@
-# create this file to treat directory as package
\ No newline at end of file
+# create this file to treat directory as package
+import importlib
+import os
+
+# ソース名 -> "モジュール:クラス"。実際に使うソースのモジュールだけをインポートする
+SOURCE_REGISTRY = {
+    "connpass": "sources.connpass:ConnpassSource",
+    "yokoari": "sources.yokoari:YokoariSource",
+    "venue": "sources.venue:VenueSource",
+}
+
+
+def load_source_class(name):
+    """登録名からソースのクラスを読み込む（未登録なら KeyError）"""
+    module_name, class_name = SOURCE_REGISTRY[name].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def resolve_webhook(spec):
+    """config.SOURCES の1要素の webhook（環境変数名）を URL にする。未設定なら None"""
+    return os.environ.get(spec["webhook"]) if spec.get("webhook") else None
+
+
+def create_source(spec):
+    """
+    config.SOURCES の1要素からソースを作る。
+
+    webhook は環境変数名として解決し、options はソースの既定設定の上書きとして渡す。
+    """
+    source_class = load_source_class(spec["type"])
+    return source_class(webhook_url=resolve_webhook(spec), name=spec["name"], options=spec.get("options"))
@@ -1,14 +1,81 @@
 from abc import ABC, abstractmethod
-import requests
-import json
+from datetime import datetime, timedelta, timezone
+from .http_cache import get_http_cache
+from .slack import get_delivery
+
+JST = timezone(timedelta(hours=9))
+
+
+def parse_datetime(value):
+    """ISO 8601 の文字列（末尾 Z も可）をタイムゾーン付き datetime にする。空なら None"""
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=JST)
+
+
+class Event:
+    """
+    全ソース共通のイベント。
+
+    各ソースは取得した時点で一度だけこの型に変換し、APIやHTMLの生データは保持しない。
+    日時はパース済みのタイムゾーン付き datetime で持つ（不明なら None）。
+    """
+
+    __slots__ = (
+        "source", "event_id", "title", "url",
+        "started_at", "ended_at", "updated_at", "date",
+        "open_time", "start_time", "end_time",
+        "owner", "place", "address", "limit", "accepted", "summary",
+        "change",
+    )
+
+    def __init__(self, source, event_id, title, url=None,
+                 started_at=None, ended_at=None, updated_at=None, date=None,
+                 open_time="", start_time="", end_time="",
+                 owner=None, place=None, address=None, limit=None, accepted=0, summary="",
+                 change=None):
+        self.source = source
+        self.event_id = event_id
+        self.title = title
+        self.url = url
+        self.started_at = started_at
+        self.ended_at = ended_at
+        self.updated_at = updated_at
+        # 開催日。started_at が分かればその日付（JST）
+        self.date = date or (started_at.astimezone(JST).date() if started_at else None)
+        # 時刻が文字列でしか分からないソース（横浜アリーナなど）用の表示用の時刻
+        self.open_time = open_time
+        self.start_time = start_time
+        self.end_time = end_time
+        self.owner = owner
+        self.place = place
+        self.address = address
+        self.limit = limit
+        self.accepted = accepted
+        self.summary = summary
+        # 前回通知からの変化（EventStore.NEW / CHANGED / None）
+        self.change = change
+
+    @property
+    def is_full(self):
+        return bool(self.limit and (self.accepted or 0) >= self.limit)
+
+    def __repr__(self):
+        return f"Event({self.source!r}, {self.event_id!r}, {self.title!r}, {self.started_at or self.date})"
+
 
 class BaseEventSource(ABC):
-    def __init__(self, webhook_url):
+    def __init__(self, webhook_url, name=None, options=None):
         self.webhook_url = webhook_url
+        # 設定（config.SOURCES）上の名前。ログや状態の保存先の区別に使う
+        self.name = name or self.__class__.__name__
+        # config.SOURCES の "options"。各ソースの既定設定を上書きする
+        self.options = options or {}
 
     @abstractmethod
     def fetch_events(self):
-        """イベント情報を取得してリストで返す"""
+        """イベント情報を取得して Event のリストで返す"""
         pass
 
     @abstractmethod
@@ -16,22 +83,54 @@ class BaseEventSource(ABC):
         """Slack送信用のメッセージペイロードを作成する"""
         pass
 
-    def send_notification(self, payload):
-        """Slackに通知を送る共通メソッド"""
-        if not payload:
-            return
-
-        if not self.webhook_url:
-            print(f"Warning: Webhook URL not set for {self.__class__.__name__}")
-            return
-
-        try:
-            response = requests.post(
-                self.webhook_url,
-                data=json.dumps(payload),
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            print(f"Message sent from {self.__class__.__name__}")
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending to Slack: {e}")
+    def http_get(self, url, params=None, headers=None, timeout=10, ttl=None, throttle=None):
+        """共有ディスクキャッシュ（条件付きリクエスト対応）を通して GET する"""
+        return get_http_cache().get(url, params=params, headers=headers, timeout=timeout, ttl=ttl, throttle=throttle)
+
+    def parse_cached(self, response, name, parser):
+        """http_get のレスポンス本文が前回と同じなら、保存済みのパース結果を返す"""
+        return get_http_cache().memoize(response, name, parser)
+
+    def send_notification(self, payload, webhook_url=None):
+        """
+        Slackに通知を送る共通メソッド。全メッセージを送信できたら True、失敗したら False を返す。
+
+        webhook_url を指定するとソースの通知先の代わりにそこへ送る（購読者ごとの通知など）。
+
+        ブロック数が多いペイロードは複数のメッセージに分けて送る（sources.slack）。
+        送る前にアウトボックスへ保存するため、失敗したメッセージは次回の実行の最初に再送される。
+        """
+        return self.send_notifications([(payload, webhook_url)])[0]
+
+    def send_notifications(self, notifications):
+        """
+        (ペイロード, Webhook URL[, state]) のリストをまとめて送り、それぞれ全メッセージを送信できたかのリストを返す。
+
+        全部を送信キューに入れてから結果を待つので、Webhook が違う通知は並行して送られる。
+        Webhook URL が None ならソースの通知先に送る。
+        state（EventStore.notified_state）はアウトボックスに保存され、次回の実行の再送で送れたときに記録される。
+        """
+        futures = []
+        for payload, webhook_url, *rest in notifications:
+            state = rest[0] if rest else None
+            webhook_url = webhook_url or self.webhook_url
+            if not payload:
+                futures.append(None)
+            elif not webhook_url:
+                print(f"Warning: Webhook URL not set for {self.name}")
+                futures.append(None)
+            else:
+                futures.append(get_delivery().submit(webhook_url, payload, source=self.name, state=state))
+
+        results = []
+        for future in futures:
+            if future is None:
+                results.append(False)
+                continue
+            sent, total = future.result()
+            if sent == total:
+                print(f"Message sent from {self.name} ({total}通)")
+            else:
+                print(f"Error sending to Slack from {self.name}: {total}通中 {sent}通のみ送信しました")
+            results.append(sent == total)
+        return results
@@ -0,0 +1,163 @@
+import json
+import math
+import re
+import threading
+import time
+from pathlib import Path
+
+from .db import connect
+from .ranking import tokenize
+
+_LEVEL = re.compile(r"Lv\.?\s*([1-5])", re.IGNORECASE)
+_HOUR = re.compile(r"(\d{1,2}):(\d{2})")
+
+
+def _level_number(level):
+    m = _LEVEL.search(level or "")
+    return int(m.group(1)) if m else None
+
+
+def _start_hour(start_time):
+    m = _HOUR.match(start_time or "")
+    return int(m.group(1)) if m else None
+
+
+class CongestionModel:
+    """
+    過去の混雑予測（Gemini の結果）から、似た公演の混雑レベルを手元で推定するモデル。
+
+    履歴は SQLite に保存し、起動時にメモリ上の転置インデックス（タイトルのトークン -> 履歴）に読み込む。
+    推定は近傍法で、タイトルの類似度に曜日・開演時刻の一致を加えた類似度で上位の履歴を選び、
+    類似度で重み付けした多数決でレベルを決める。
+    タイトルの類似度はトークンを IDF（同じ会場の履歴での出現の少なさ）で重み付けした Jaccard 係数で、
+    「ツアー」「横浜公演」のようにどの公演にも付く語ではなく、アーティスト名のような珍しい語で決まる。
+    確信度（勝ったレベルの票の割合 × 最も似た履歴の類似度）が低いとき、
+    または似た履歴が min_neighbors 件に満たず、タイトルがほぼ同じ（exact_similarity 以上）履歴もないときは
+    None を返し、呼び出し側は Gemini に問い合わせてその結果を record() する。
+    """
+
+    def __init__(self, path, min_confidence=0.6, neighbors=5, min_similarity=0.4, max_history=5000,
+                 min_neighbors=3, exact_similarity=0.9):
+        self.path = Path(path)
+        self.min_confidence = min_confidence
+        self.neighbors = neighbors
+        self.min_similarity = min_similarity
+        self.max_history = max_history
+        self.min_neighbors = min_neighbors
+        self.exact_similarity = exact_similarity
+        self._lock = threading.Lock()
+        self._rows = {}       # 履歴の id -> (venue, tokens, weekday, hour, level_num, prediction)
+        self._postings = {}   # (venue, トークン) -> 履歴の id の集合
+        self._venue_rows = {}  # 会場 -> 履歴の件数（IDF の計算に使う）
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, venue TEXT NOT NULL, title TEXT NOT NULL,"
+                " weekday INTEGER, start_time TEXT, level INTEGER NOT NULL,"
+                " prediction TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            rows = conn.execute(
+                "SELECT id, venue, title, weekday, start_time, level, prediction FROM history"
+                " ORDER BY id DESC LIMIT ?", (max_history,)
+            ).fetchall()
+        for row_id, venue, title, weekday, start_time, level, prediction in rows:
+            self._add(row_id, venue, title, weekday, start_time, level, json.loads(prediction))
+
+    def _add(self, row_id, venue, title, weekday, start_time, level, prediction):
+        tokens = frozenset(tokenize(title))
+        self._rows[row_id] = (venue, tokens, weekday, _start_hour(start_time), level, prediction)
+        self._venue_rows[venue] = self._venue_rows.get(venue, 0) + 1
+        for token in tokens:
+            self._postings.setdefault((venue, token), set()).add(row_id)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def record(self, venue, title, weekday, start_time, prediction):
+        """Gemini の予測を履歴に加える（レベルが読み取れない予測は使わない）"""
+        level = _level_number(prediction.get("level"))
+        if level is None:
+            return
+        with connect(self.path) as conn:
+            row_id = conn.execute(
+                "INSERT INTO history (venue, title, weekday, start_time, level, prediction, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (venue, title, weekday, start_time, level, json.dumps(prediction, ensure_ascii=False), time.time()),
+            ).lastrowid
+            conn.execute(
+                "DELETE FROM history WHERE id NOT IN (SELECT id FROM history ORDER BY id DESC LIMIT ?)",
+                (self.max_history,),
+            )
+        with self._lock:
+            self._add(row_id, venue, title, weekday, start_time, level, prediction)
+            while len(self._rows) > self.max_history:
+                self._remove(min(self._rows))
+
+    def _remove(self, row_id):
+        venue, tokens = self._rows.pop(row_id)[:2]
+        self._venue_rows[venue] -= 1
+        for token in tokens:
+            self._postings.get((venue, token), set()).discard(row_id)
+
+    def predict(self, venue, title, weekday, start_time):
+        """
+        (予測, 確信度) を返す。確信度が min_confidence 未満、または根拠になる履歴が足りなければ予測は None。
+
+        予測は Gemini と同じ形式（level / peak_time / reason）で、"model": "local" が付く。
+        """
+        tokens = frozenset(tokenize(title))
+        hour = _start_hour(start_time)
+        with self._lock:
+            candidates = set()
+            for token in tokens:
+                candidates |= self._postings.get((venue, token), set())
+            weights = {}
+            scored = []
+            for row_id in candidates:
+                _, row_tokens, row_weekday, row_hour, level, prediction = self._rows[row_id]
+                for token in row_tokens - weights.keys():
+                    weights[token] = self._idf(venue, token)
+                for token in tokens - weights.keys():
+                    weights[token] = self._idf(venue, token)
+                union = sum(weights[token] for token in tokens | row_tokens)
+                title_similarity = sum(weights[token] for token in tokens & row_tokens) / union
+                similarity = 0.7 * title_similarity
+                similarity += 0.15 * (weekday is not None and row_weekday == weekday)
+                similarity += 0.15 * (hour is not None and row_hour == hour)
+                if similarity >= self.min_similarity:
+                    scored.append((similarity, title_similarity, row_id, level, row_hour, prediction))
+
+        if not scored:
+            return None, 0.0
+        scored.sort(reverse=True)
+        top = scored[:self.neighbors]
+        votes = {}
+        for similarity, _, _, level, _, _ in top:
+            votes[level] = votes.get(level, 0.0) + similarity
+        level, weight = max(votes.items(), key=lambda item: item[1])
+        confidence = weight / sum(votes.values()) * top[0][0]
+        if confidence < self.min_confidence:
+            return None, confidence
+        # 1〜2件の履歴だけでは決めない（同じアーティストのほぼ同じタイトルの公演があれば別）
+        if len(top) < self.min_neighbors and max(item[1] for item in top) < self.exact_similarity:
+            return None, confidence
+
+        # 同じレベルの中で最も似た履歴の表記・ピーク時間を使う
+        _, _, _, _, best_hour, best = next(item for item in top if item[3] == level)
+        peak_time = best.get("peak_time")
+        if hour is not None and best_hour != hour:
+            # 開演時刻が違う公演のピーク時間はそのまま使えないので、開演前の1時間とする
+            peak_time = f"{max(hour - 1, 0):02d}:00-{hour:02d}:00頃（開演前）"
+        prediction = {
+            "level": best.get("level"),
+            "peak_time": peak_time,
+            "reason": f"過去の類似公演{len(top)}件から推定",
+            "model": "local",
+        }
+        return prediction, confidence
+
+    def _idf(self, venue, token):
+        """同じ会場の履歴での token の IDF（履歴にない語ほど大きい。ロックを取った状態で呼ぶ）"""
+        count = len(self._postings.get((venue, token), ()))
+        return 1.0 + math.log((self._venue_rows.get(venue, 0) + 1) / (count + 1))
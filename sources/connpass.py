@@ -1,13 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta, timezone
+import copy
+import hashlib
+import json
+import threading
 import requests
 import time
-from .base import BaseEventSource
+from .base import BaseEventSource, Event, JST, parse_datetime
+from .dedup import NearDuplicateDetector
+from .event_store import EventStore
+from .metrics import get_metrics
+from .ranking import RankingIndex
+from .subscriptions import SubscriptionIndex
+from . import resolve_webhook
 import config
 
+
+class RateLimiter:
+    """複数スレッドで共有するリクエスト間隔の制御（requests_per_second を超えないように待機する）"""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
 class ConnpassSource(BaseEventSource):
+    def __init__(self, webhook_url, name="connpass", options=None):
+        super().__init__(webhook_url, name=name, options=options)
+        # config.TECH_CONFIG を options で上書きしたもの（キーワードのグループごとに別ソースにできる）
+        self.settings = {**config.TECH_CONFIG, **self.options}
+        self.event_store = EventStore(self.settings["STATE_PATH"])
+        self._rendered_events = []
+        self.ranking_index = None
+        self._state_items = {}  # event_id -> _state_item（fetch_events ごとに作り直す）
+        # このソースを対象にした購読者（config.SUBSCRIBERS）。条件は1つの SubscriptionIndex にまとめる
+        self.subscribers = self._load_subscribers()
+        self.subscriptions = SubscriptionIndex(self.subscribers) if self.subscribers else None
+        self._main_event_ids = set()
+        self._fetched_events = None
+        self._audiences = None
+        self._subscriber_changes = {}  # 購読者の name -> {event_id: 前回通知からの変化}
+        self._subscriber_payloads = []
+
+    def _load_subscribers(self):
+        """config.SUBSCRIBERS のうちこのソースが対象のものを、省略された条件をソースの設定で補って返す"""
+        tech = self.settings
+        subscribers = []
+        for sub in config.SUBSCRIBERS:
+            if sub.get("source") != self.name or not sub.get("enabled", True):
+                continue
+            subscribers.append({
+                **sub,
+                "keywords": sub.get("keywords") or tech["KEYWORDS"],
+                "locations": sub.get("locations") or tech["LOCATIONS"],
+                "days_ahead": min(sub.get("days_ahead") or tech["DAYS_AHEAD"], tech["DAYS_AHEAD"]),
+                "webhook_url": resolve_webhook(sub),
+            })
+        return subscribers
+
     def fetch_events(self):
-        # v2エンドポイント（eventsは複数形）
-        url = "https://connpass.com/api/v2/events/"
+        url = self.settings["API_URL"]
         
         # ヘッダー設定
         headers = {
@@ -20,131 +81,460 @@ class ConnpassSource(BaseEventSource):
             headers["X-API-Key"] = config.CONNPASS_API_KEY
         else:
             print("⚠️  Warning: CONNPASS_API_KEY is missing.")
-        
-        params = {
-            "keyword": "データ",
-            "keyword_or": "メルカリ,LINE",
-            "count": 50,
-            "order": 2,  # 更新日時順
-            # 東京・神奈川・オンライン
-            "prefecture": "tokyo,kanagawa,online",
-        }
+
+        tech = self.settings
+        prefectures = self._prefectures(tech["LOCATIONS"])
+
+        # 日付の絞り込みはAPI側で行い、期間外のイベントを転送しない
+        now, target_end = self._date_window()
+        window_params = self._date_window_params(now, target_end)
+
+        queries, main_keys = self._build_queries(prefectures, window_params)
         
         seen_event_ids = set()
 
         print(
             "🔍 Connpass API検索開始: "
-            "keyword='データ', keyword_or='メルカリ,LINE', "
-            f"prefecture='{params['prefecture']}'"
+            f"keywords={tech['KEYWORDS']}, "
+            f"prefecture='{','.join(prefectures)}', "
+            f"期間={now.strftime('%Y-%m-%d')}〜{target_end.strftime('%Y-%m-%d')}"
         )
+        if len(queries) > len(tech["KEYWORDS"]):
+            print(f"   📮 購読者の条件のための追加クエリ: {len(queries) - len(tech['KEYWORDS'])}件")
 
-        all_events = self._fetch_events_from_api(url, params, headers, seen_event_ids)
+        self.fetch_stats = {"requests": 0, "cache_hits": 0, "bytes": 0, "fetched": 0, "unique": 0, "kept": 0}
+        self._main_event_ids = set()
+        all_events = self._fetch_all_pages(url, queries, headers, seen_event_ids, main_keys)
 
         print(f"📊 合計取得件数（フィルタ前）: {len(all_events)}件")
-        filtered_events = self._filter_events(all_events)
+        # API側で期間を絞っているが、念のためクライアント側でも同じ条件で確認する
+        with get_metrics().stage(self.name, "filter"):
+            filtered_events = self._filter_events(all_events)
         print(f"📅 日付フィルタ後: {len(filtered_events)}件")
 
-        return filtered_events
+        metrics = get_metrics()
+        stats = self.fetch_stats
+        stats["unique"] = len(all_events)
+        if self.settings["DEDUP"]["ENABLED"]:
+            with metrics.stage(self.name, "dedup"):
+                filtered_events = self._merge_near_duplicates(filtered_events)
+        stats["kept"] = len(filtered_events)
+        print(
+            f"📦 転送量: {stats['bytes'] / 1024:.1f}KB ({stats['requests']}リクエスト, キャッシュ {stats['cache_hits']}件), "
+            f"取得 {stats['fetched']}件 → 重複除外後 {stats['unique']}件 → 採用 {stats['kept']}件"
+        )
+
+        for stage in ("fetched", "unique", "kept"):
+            metrics.incr("events_total", stats[stage], source=self.name, stage=stage)
+
+        # ソース自身の通知は KEYWORDS × LOCATIONS のクエリで見つかったイベントだけ（購読者のための追加分は除く）
+        main_events = filtered_events
+        if self.subscriptions is not None:
+            main_events = [ev for ev in filtered_events if ev.event_id in self._main_event_ids]
+
+        # EventStore に渡す内容のハッシュはイベントごとに1回だけ計算し、ソース自身と全購読者で使い回す
+        self._state_items = {}
+        if self.settings["NOTIFY_ONLY_CHANGES"]:
+            with metrics.stage(self.name, "filter"):
+                self._state_items = {ev.event_id: self._state_item(ev) for ev in filtered_events}
+                main_events = self._select_changes(main_events)
+            metrics.incr("events_total", len(main_events), source=self.name, stage="changed")
+
+        # 取得したイベント全体のタイトル・説明文の転置インデックスを一度だけ作っておく
+        # （create_message でソース自身と各購読者のイベントを並べ替えるのに使う）
+        with metrics.stage(self.name, "index"):
+            self.ranking_index = RankingIndex(filtered_events)
+
+        self._audiences = {None: main_events}
+        result = main_events
+        if self.subscriptions is not None:
+            with metrics.stage(self.name, "route"):
+                routes = self._route_subscribers(filtered_events)
+            self._audiences.update(routes)
+            # 誰かに通知するイベントをまとめて返す（どれもなければ create_message / send_notification は呼ばれない）
+            result = list({ev.event_id: ev for events in [main_events, *routes.values()] for ev in events}.values())
+        self._fetched_events = result
+        return result
+
+    def _route_subscribers(self, events):
+        """購読者の name -> 通知するイベント（NOTIFY_ONLY_CHANGES なら購読者ごとの新規・変更分だけ）"""
+        routes = self.subscriptions.route(events)
+        self._subscriber_changes = {}
+        if self.settings["NOTIFY_ONLY_CHANGES"]:
+            changes = self.event_store.diff_many({
+                self._subscriber_key(name): [self._state_items_for(ev) for ev in routed]
+                for name, routed in routes.items()
+            })
+            for name, routed in routes.items():
+                diff = changes[self._subscriber_key(name)]
+                routes[name] = [ev for ev in routed if diff.get(str(ev.event_id))]
+                # change は購読者ごとに違うので Event には書かずに持っておき、通知する分だけ create_message で付ける
+                self._subscriber_changes[name] = diff
+        routes = {name: routed for name, routed in routes.items() if routed}
+        total = sum(len(routed) for routed in routes.values())
+        get_metrics().incr("subscriber_events_total", total, source=self.name)
+        print(f"📮 購読者への振り分け: {len(self.subscribers)}人中 {len(routes)}人, 計{total}件")
+        return routes
+
+    @staticmethod
+    def _with_changes(events, changes):
+        """
+        changes（event_id -> 前回通知からの変化）を付けた Event のコピーのリスト。
+
+        ソース自身の通知と同じ Event を書き換えないようにコピーする（changes が None ならそのまま）。
+        """
+        if changes is None:
+            return events
+        copies = []
+        for ev in events:
+            ev = copy.copy(ev)
+            ev.change = changes.get(str(ev.event_id))
+            copies.append(ev)
+        return copies
+
+    def _subscriber_key(self, name):
+        """購読者ごとの通知済みの記録（EventStore）の区別に使う名前"""
+        return f"{self.name}>{name}"
+
+    def _prefectures(self, locations):
+        """LOCATIONS の表記を connpass API の prefecture の値にする（対応表にないものは使わない）"""
+        table = self.settings["PREFECTURES"]
+        return [table[loc] for loc in locations if loc in table]
+
+    def _build_queries(self, prefectures, window_params):
+        """
+        API のクエリの一覧と、ソース自身の通知に使うクエリの (keyword, prefecture) の集合を返す。
+
+        キーワードごとに1クエリ。都道府県はカンマ区切りでまとめて指定できるため、
+        キーワード×都道府県で分割するよりリクエスト数（=レート制限の待ち時間）が少ない。
+        購読者の条件にしかないキーワード・都道府県は、キーワードごとに足りない都道府県だけを追加で検索する。
+        """
+        tech = self.settings
+
+        def query(keyword, prefs):
+            return {
+                "keyword": keyword,
+                "count": tech["PAGE_SIZE"],
+                "order": 2,  # 更新日時順
+                "prefecture": ",".join(prefs),
+                **window_params,
+            }
+
+        queries = [query(keyword, prefectures) for keyword in tech["KEYWORDS"]]
+        main_keys = {(q["keyword"], q["prefecture"]) for q in queries}
+        needed = {}
+        for sub in self.subscribers:
+            for keyword in sub["keywords"]:
+                needed.setdefault(keyword, set()).update(self._prefectures(sub["locations"]))
+        for keyword, prefs in needed.items():
+            if keyword in tech["KEYWORDS"]:
+                extra = sorted(prefs - set(prefectures))
+                if extra:
+                    queries.append(query(keyword, extra))
+            else:
+                queries.append(query(keyword, sorted(prefs)))
+        return queries, main_keys
+
+    def _merge_near_duplicates(self, events):
+        """同じ勉強会の重複掲載をまとめ、各クラスタで最も古い掲載だけを残す"""
+        dedup = self.settings["DEDUP"]
+        detector = NearDuplicateDetector(
+            similarity=dedup["SIMILARITY"],
+            similarity_other_owner=dedup["SIMILARITY_OTHER_OWNER"],
+            max_start_diff_minutes=dedup["MAX_START_DIFF_MINUTES"],
+            ignore_words=dedup["IGNORE_WORDS"],
+            min_title_length_other_owner=dedup["MIN_TITLE_LENGTH_OTHER_OWNER"],
+        )
+        kept, clusters = detector.dedup(events)
+        # 残した掲載が購読者のための追加クエリでしか見つかっていなくても、まとめた掲載のどれかが
+        # ソース自身のクエリで見つかっていればソース自身の通知に含める
+        for representative, duplicates in clusters:
+            if any(ev.event_id in self._main_event_ids for ev in duplicates):
+                self._main_event_ids.add(representative.event_id)
+        get_metrics().incr("events_total", len(events) - len(kept), source=self.name, stage="near_duplicate")
+        if clusters:
+            print(f"🧬 類似イベントの統合: {len(events)}件 → {len(kept)}件 ({len(clusters)}グループ)")
+            for representative, duplicates in clusters[:3]:  # 最初の3グループのみ表示
+                titles = ", ".join(ev.title[:30] for ev in duplicates)
+                print(f"   🔗 {representative.title[:30]} ← {titles}")
+        return kept
+
+    def _rank_events(self, events, subscriber=None):
+        """関連度の高い順に TOP_N 件を返す（subscriber を渡すとその購読者のキーワード・開催地・件数で並べる）"""
+        tech = self.settings
+        sub = subscriber or {}
+        index = self.ranking_index
+        if index is None or not index.covers(events):
+            index = RankingIndex(events)
+        return index.rank(
+            sub.get("keywords", tech["KEYWORDS"]), sub.get("locations", tech["LOCATIONS"]),
+            tech["RANKING_WEIGHTS"], sub.get("days_ahead", tech["DAYS_AHEAD"]),
+            top_n=sub.get("top_n") or tech["TOP_N"], events=events,
+        )
+
+    def _select_changes(self, events, state_key=None, verbose=True):
+        """前回までに通知した内容から新規・変更があったイベントだけを返す（"change" に種別を入れる）"""
+        changes = self.event_store.diff(state_key or self.name, [self._state_items_for(ev) for ev in events])
+        selected = []
+        for ev in events:
+            change = changes.get(str(ev.event_id))
+            if change:
+                ev.change = change
+                selected.append(ev)
+
+        new_count = sum(1 for ev in selected if ev.change == EventStore.NEW)
+        if verbose:
+            print(f"🆕 前回からの差分: 新規 {new_count}件, 変更 {len(selected) - new_count}件 (変化なし {len(events) - len(selected)}件)")
+        return selected
+
+    def _state_items_for(self, ev):
+        """fetch_events で計算済みの _state_item があれば使う"""
+        item = self._state_items.get(ev.event_id)
+        return item if item is not None else self._state_item(ev)
+
+    def _state_item(self, ev):
+        """EventStore に渡す (event_id, updated_at, 内容のハッシュ)"""
+        # 通知文に影響する項目だけをハッシュする（参加人数の増減だけでは再通知しない）
+        content = [
+            ev.title, ev.started_at.isoformat(), ev.limit, ev.is_full, ev.url, ev.owner,
+        ]
+        content_hash = hashlib.sha256(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+        updated_at = ev.updated_at.isoformat() if ev.updated_at else None
+        return ev.event_id, updated_at, content_hash
+
+    def send_notification(self, payload, webhook_url=None):
+        """
+        送信できたら、通知したイベントを EventStore に記録する。
+
+        webhook_url を指定するとソース自身のメッセージをソースの通知先の代わりにそこへ送る（BaseEventSource と同じ）。
+
+        購読者ごとのメッセージ（create_message で作ったもの）もそれぞれの Webhook に送り、記録も購読者ごとに残す。
+        送れなかった通知は、次回の実行の最初に再送できたときに記録される（main.replay_outbox）。
+        すべて送信できたら True を返す。
+        """
+        subscribers = []
+        for sub, sub_payload, rendered in self._subscriber_payloads:
+            if sub["webhook_url"]:
+                subscribers.append((sub, sub_payload, rendered))
+            else:
+                print(f"Warning: Webhook URL not set for subscriber {sub['name']} ({sub.get('webhook')})")
+        # 送れなかった通知が次回の再送で送れたときにも記録できるよう、記録する内容をアウトボックスに持たせる
+        records = ([(self.name, self._rendered_events or [])] if payload else []) + [
+            (self._subscriber_key(sub["name"]), rendered) for sub, _, rendered in subscribers
+        ]
+        records = [(key, [self._state_items_for(ev) for ev in events]) for key, events in records]
+        notifications = ([(payload, webhook_url)] if payload else []) + [
+            (sub_payload, sub["webhook_url"]) for sub, sub_payload, _ in subscribers
+        ]
+        results = self.send_notifications([
+            (notify_payload, webhook_url, self.event_store.notified_state(key, items) if items else None)
+            for (notify_payload, webhook_url), (key, items) in zip(notifications, records)
+        ])
+
+        for (key, items), ok in zip(records, results):
+            if ok and items:
+                self.event_store.mark_notified(key, items)
+        if payload:
+            sent = results.pop(0)
+        else:
+            # ソース自身に通知するイベントがなく、購読者にだけ送る場合
+            sent = bool(self._subscriber_payloads)
+        return sent and len(subscribers) == len(self._subscriber_payloads) and all(results)
+
+    def _date_window(self):
+        """通知対象期間（現在〜DAYS_AHEAD日後, JST）を返す"""
+        now = datetime.now(timezone(timedelta(hours=9)))
+        return now, now + timedelta(days=self.settings["DAYS_AHEAD"])
+
+    def _date_window_params(self, start, end):
+        """
+        期間をAPIの ymd / ym パラメータに変換する。
+
+        ymd は日単位で期間ぴったりに絞れるが、期間が長いとURLが長くなるため
+        YMD_MAX_DAYS を超える場合は月単位の ym にする（はみ出た分は _filter_events で除外）。
+        """
+        days = (end.date() - start.date()).days + 1
+        if days <= self.settings["YMD_MAX_DAYS"]:
+            return {"ymd": ",".join((start + timedelta(days=d)).strftime("%Y%m%d") for d in range(days))}
+
+        months = []
+        year, month = start.year, start.month
+        while (year, month) <= (end.year, end.month):
+            months.append(f"{year}{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return {"ym": ",".join(months)}
+
+    def _fetch_all_pages(self, url, queries, headers, seen_event_ids, main_keys=None):
+        """
+        全クエリの全ページを並行取得し、seen_event_ids で重複を除外しながらマージする。
+
+        まず各クエリの1ページ目を取得し、results_available から残りのページの
+        start を割り出して追加で投入する。リクエストの発行間隔は全スレッド共通の
+        RateLimiter で制御する。
+        main_keys（(keyword, prefecture) の集合）に含まれるクエリで見つかったイベントの id は
+        self._main_event_ids に記録する（None なら全クエリ）。
+        """
+        tech = self.settings
+        page_size = tech["PAGE_SIZE"]
+        max_start = page_size * (tech["MAX_PAGES"] - 1) + 1
+        limiter = RateLimiter(tech["REQUESTS_PER_SECOND"])
+
+        all_events = []
+        with ThreadPoolExecutor(max_workers=tech["MAX_WORKERS"]) as pool:
+            pending = {}
+            for query in queries:
+                params = dict(query, start=1)
+                pending[pool.submit(self._fetch_events_from_api, url, params, headers, limiter)] = params
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    params = pending.pop(future)
+                    raw_events, available, nbytes, cached = future.result()
+                    self.fetch_stats["requests"] += 1
+                    self.fetch_stats["cache_hits"] += int(cached)
+                    self.fetch_stats["bytes"] += nbytes
+                    self.fetch_stats["fetched"] += len(raw_events)
+                    with get_metrics().stage(self.name, "parse"):
+                        all_events.extend(self._dedup_events(raw_events, seen_event_ids))
+                    if main_keys is None or (params["keyword"], params["prefecture"]) in main_keys:
+                        self._main_event_ids.update(ev.get("id") or ev.get("event_id") for ev in raw_events)
+
+                    # 1ページ目の結果から残りのページを投入する
+                    if params["start"] == 1:
+                        last_start = min(available, max_start)
+                        if available > max_start + page_size - 1:
+                            print(f"   ⚠️  keyword='{params['keyword']}': {available}件中 {tech['MAX_PAGES']}ページ分のみ取得します")
+                        for start in range(1 + page_size, last_start + 1, page_size):
+                            next_params = dict(params, start=start)
+                            pending[pool.submit(self._fetch_events_from_api, url, next_params, headers, limiter)] = next_params
+
+        return all_events
     
-    def _fetch_events_from_api(self, url, params, headers, seen_event_ids, max_retries=3):
-        """APIからイベントを取得し、重複を除外する（リトライ機能付き）"""
+    def _fetch_events_from_api(self, url, params, headers, limiter):
+        """
+        APIから1ページ分のイベントを取得する。
+        429 / 5xx のリトライは共有セッション側（http_client.RetryPolicy）で行う。
+        (イベント一覧, 総件数, 受信バイト数, キャッシュ利用有無) を返す
+        """
         request_params = params.copy()
         if config.CONNPASS_API_KEY and "X-API-Key" in headers:
             # クエリパラメータとしても追加（APIの仕様により異なる可能性があるため）
             request_params["key"] = config.CONNPASS_API_KEY
         
-        for attempt in range(max_retries):
-            try:
-                res = requests.get(url, params=request_params, headers=headers, timeout=10)
-                
-                # ステータスコードを確認
-                if res.status_code == 404:
-                    print(f"⚠️  404エラー: エンドポイントが見つかりません")
-                    print(f"   URL: {url}")
-                    print(f"   パラメータ: {request_params}")
-                    print(f"   レスポンス: {res.text[:500]}")
-                    return []
-                
-                # 429エラー（レート制限）の場合はリトライ
-                if res.status_code == 429:
-                    if attempt < max_retries - 1:
-                        wait_time = (attempt + 1) * 5  # 5秒、10秒、15秒と段階的に待機
-                        print(f"⚠️  429エラー（レート制限）: {wait_time}秒待機してリトライします... (試行 {attempt + 1}/{max_retries})")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print(f"❌ HTTPエラー (ステータスコード: 429) - リトライ上限に達しました")
-                        print(f"   パラメータ: {params}")
-                        print(f"   レスポンス: {res.text[:500]}")
-                        return []
-                
-                res.raise_for_status()
-                
-                raw_events = res.json().get("events", [])
-                print(f"   ✅ API成功: {len(raw_events)}件のイベントを取得")
-                
-                # 重複を除外
-                unique_events = []
-                duplicate_count = 0
-                for ev in raw_events:
-                    # connpass API v2では 'id' フィールドを使用
-                    eid = ev.get("id") or ev.get("event_id")
-                    if not eid:
-                        print(f"   ⚠️  IDが存在しないイベント: {ev.get('title', 'N/A')[:30]}")
-                        continue
-                    
-                    if eid not in seen_event_ids:
-                        seen_event_ids.add(eid)
-                        unique_events.append(ev)
-                    else:
-                        duplicate_count += 1
-                        if duplicate_count <= 3:  # 最初の3件の重複のみ表示
-                            print(f"   🔄 重複スキップ: id={eid}, title={ev.get('title', 'N/A')[:30]}")
-                
-                if duplicate_count > 0:
-                    print(f"   ℹ️  重複除外: {len(raw_events)}件 → {len(unique_events)}件 (重複: {duplicate_count}件)")
-                else:
-                    print(f"   ℹ️  重複なし: {len(raw_events)}件")
-                
-                return unique_events
-                
-            except requests.exceptions.HTTPError as e:
-                if res.status_code == 429 and attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 5
-                    print(f"⚠️  429エラー（レート制限）: {wait_time}秒待機してリトライします... (試行 {attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    print(f"❌ HTTPエラー (ステータスコード: {res.status_code})")
-                    print(f"   パラメータ: {params}")
-                    print(f"   レスポンス: {res.text[:500]}")
-                    return []
-            except Exception as e:
-                print(f"❌ Connpass API error (params: {params}): {e}")
-                if 'res' in locals():
-                    print(f"   レスポンス: {res.text[:200]}")
-                return []
+        metrics = get_metrics()
+        try:
+            with metrics.stage(self.name, "http_fetch"):
+                res = self.http_get(
+                    url, params=request_params, headers=headers, timeout=10,
+                    ttl=self.settings["CACHE_TTL_SECONDS"], throttle=limiter.wait,
+                )
+            
+            # ステータスコードを確認
+            if res.status_code == 404:
+                print(f"⚠️  404エラー: エンドポイントが見つかりません")
+                print(f"   URL: {url}")
+                print(f"   パラメータ: {params}")
+                print(f"   レスポンス: {res.text[:500]}")
+                return [], 0, 0, False
+            
+            if res.status_code == 429:
+                print(f"❌ HTTPエラー (ステータスコード: 429) - リトライ上限に達しました")
+                print(f"   パラメータ: {params}")
+                print(f"   レスポンス: {res.text[:500]}")
+                return [], 0, 0, False
+            
+            res.raise_for_status()
+            
+            with metrics.stage(self.name, "parse"):
+                data = res.json()
+            raw_events = data.get("events", [])
+            available = data.get("results_available", len(raw_events))
+            print(f"   ✅ API成功: keyword='{params.get('keyword')}', start={params.get('start')}: {len(raw_events)}件 (全{available}件)")
+            transferred = 0 if res.from_cache or res.not_modified else len(res.content)
+            return raw_events, available, transferred, res.from_cache or res.not_modified
+            
+        except requests.exceptions.HTTPError as e:
+            print(f"❌ HTTPエラー (ステータスコード: {res.status_code})")
+            print(f"   パラメータ: {params}")
+            print(f"   レスポンス: {res.text[:500]}")
+            return [], 0, 0, False
+        except Exception as e:
+            print(f"❌ Connpass API error (params: {params}): {e}")
+            if 'res' in locals():
+                print(f"   レスポンス: {res.text[:200]}")
+            return [], 0, 0, False
+
+    def _dedup_events(self, raw_events, seen_event_ids):
+        """
+        seen_event_ids に含まれないイベントだけを Event に変換して返す（seen_event_ids は更新される）。
+        APIの生データはここで捨てる。
+        """
+        unique_events = []
+        duplicate_count = 0
+        for ev in raw_events:
+            # connpass API v2では 'id' フィールドを使用
+            eid = ev.get("id") or ev.get("event_id")
+            if not eid:
+                print(f"   ⚠️  IDが存在しないイベント: {ev.get('title', 'N/A')[:30]}")
+                continue
+            
+            if eid not in seen_event_ids:
+                seen_event_ids.add(eid)
+                event = self._to_event(ev)
+                if event:
+                    unique_events.append(event)
+            else:
+                duplicate_count += 1
+                if duplicate_count <= 3:  # 最初の3件の重複のみ表示
+                    print(f"   🔄 重複スキップ: id={eid}, title={ev.get('title', 'N/A')[:30]}")
+        
+        if duplicate_count > 0:
+            print(f"   ℹ️  重複除外: {len(raw_events)}件 → {len(unique_events)}件 (重複: {duplicate_count}件)")
         
-        return []  # すべてのリトライが失敗した場合
+        return unique_events
+
+    def _to_event(self, ev):
+        """APIのイベント1件を Event に変換する。開始日時が読めなければ None"""
+        eid = ev.get("id") or ev.get("event_id")
+        try:
+            started_at = parse_datetime(ev.get("started_at"))
+            if not started_at:
+                raise ValueError("started_at がありません")
+            ended_at = parse_datetime(ev.get("ended_at"))
+            updated_at = parse_datetime(ev.get("updated_at"))
+        except Exception as e:
+            print(f"   ❌ 日付パースエラー (id: {eid}): {e}")
+            return None
+
+        return Event(
+            source=self.name,
+            event_id=eid,
+            title=ev.get("title") or "タイトル不明",
+            url=self._get_event_url(ev),
+            started_at=started_at,
+            ended_at=ended_at,
+            updated_at=updated_at,
+            owner=ev.get("owner_display_name"),
+            place=ev.get("place"),
+            address=ev.get("address"),
+            limit=ev.get("limit"),
+            accepted=ev.get("accepted") or 0,
+            summary=ev.get("catch") or "",
+        )
 
     def _filter_events(self, events):
         """日付範囲でフィルタリング"""
         filtered = []
-        now = datetime.now(timezone(timedelta(hours=9)))
-        target_end = now + timedelta(days=config.TECH_CONFIG["DAYS_AHEAD"])
+        now, target_end = self._date_window()
         
         print(f"📅 日付フィルタ: 現在={now.strftime('%Y-%m-%d %H:%M:%S')}, 終了日={target_end.strftime('%Y-%m-%d %H:%M:%S')}")
 
         for ev in events:
-            try:
-                start = datetime.fromisoformat(ev["started_at"].replace("Z", "+00:00"))
-                if now <= start <= target_end:
-                    filtered.append(ev)
-                else:
-                    print(f"   ⏭️  除外: {ev.get('title', 'N/A')[:30]}... (開始日時: {start.strftime('%Y-%m-%d %H:%M')})")
-            except Exception as e:
-                print(f"   ❌ 日付パースエラー (id: {ev.get('id') or ev.get('event_id')}): {e}")
-                continue
+            if now <= ev.started_at <= target_end:
+                filtered.append(ev)
+            else:
+                print(f"   ⏭️  除外: {ev.title[:30]}... (開始日時: {ev.started_at.astimezone(JST).strftime('%Y-%m-%d %H:%M')})")
         
         return filtered
 
@@ -166,38 +556,56 @@ class ConnpassSource(BaseEventSource):
         return None
 
     def create_message(self, events):
+        """
+        ソース自身の通知のペイロードを返す。
+
+        購読者がいれば、購読者ごとのペイロードも作って send_notification 用に保持する
+        （ソース自身に通知するイベントがなく、購読者にだけ送る場合は None を返す）。
+        """
         if not events: return None
-        
+
+        audiences = self._audiences if events is self._fetched_events else {None: events}
+        self._subscriber_payloads = []
+        with get_metrics().stage(self.name, "rank"):
+            for sub in self.subscribers:
+                routed = audiences.get(sub["name"])
+                if routed:
+                    rendered = self._with_changes(self._rank_events(routed, sub), self._subscriber_changes.get(sub["name"]))
+                    self._subscriber_payloads.append((sub, self._render(rendered, sub.get("header")), rendered))
+
+            main_events = audiences.get(None)
+            self._rendered_events = self._rank_events(main_events) if main_events else []
+        if not main_events:
+            return None
+        if len(self._rendered_events) < len(main_events):
+            print(f"🏅 関連度の高い {len(self._rendered_events)}件を通知します（全{len(main_events)}件）")
+        return self._render(self._rendered_events)
+
+    def _render(self, events, header=None):
+        """並べ替え済みのイベントを Slack のペイロードにする"""
         blocks = [
-            {"type": "header", "text": {"type": "plain_text", "text": "📚 データ系勉強会Pickup", "emoji": True}},
+            {"type": "header", "text": {"type": "plain_text", "text": header or "📚 データ系勉強会Pickup", "emoji": True}},
             {"type": "divider"}
         ]
-        
-        for ev in events[:10]:
-            try:
-                # 日付のパース処理を統一
-                started_at = ev.get("started_at", "").replace("Z", "+00:00")
-                start = datetime.fromisoformat(started_at).strftime("%m/%d %H:%M") if started_at else "日時不明"
-            except Exception as e:
-                print(f"Error parsing date in create_message for event {ev.get('id') or ev.get('event_id')}: {e}")
-                start = "日時不明"
-            
-            limit = ev.get("limit")
-            accepted = ev.get("accepted", 0)
-            status = "🔴満席" if limit and accepted >= limit else "🟢"
-
-            title = ev.get('title', 'タイトル不明')
-            url = self._get_event_url(ev)
-            if url:
-                title_text = f"<{url}|{title}>"
+
+        for ev in events:
+            start = ev.started_at.astimezone(JST).strftime("%m/%d %H:%M")
+            status = "🔴満席" if ev.is_full else "🟢"
+
+            if ev.url:
+                title_text = f"<{ev.url}|{ev.title}>"
             else:
-                title_text = title
+                title_text = ev.title
+            if ev.change == EventStore.NEW:
+                title_text = f"🆕 {title_text}"
+            elif ev.change == EventStore.CHANGED:
+                title_text = f"🔄更新 {title_text}"
 
             blocks.append({
                 "type": "section",
                 "text": {
                     "type": "mrkdwn",
-                    "text": f"*{start}* {status} {title_text}\n主催: {ev.get('owner_display_name') or '不明'}"
+                    "text": f"*{start}* {status} {title_text}\n主催: {ev.owner or '不明'}"
                 }
             })
             blocks.append({"type": "divider"})
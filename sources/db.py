@@ -0,0 +1,15 @@
+import sqlite3
+from contextlib import closing, contextmanager
+
+
+@contextmanager
+def connect(path, timeout=10):
+    """
+    SQLite に接続し、ブロックを抜けたらコミット（例外ならロールバック）して接続を閉じる。
+
+    スレッドごとに使えるよう、操作のたびに接続を開く
+    （sqlite3 の接続自体の with はコミットするだけで閉じない）。
+    """
+    with closing(sqlite3.connect(path, timeout=timeout)) as conn:
+        with conn:
+            yield conn
@@ -0,0 +1,184 @@
+import re
+import unicodedata
+from bisect import bisect_right
+import zlib
+
+_NUMBER = re.compile(r"\d+")
+_NON_WORD = re.compile(r"[\W_]+")
+_ONLINE = re.compile(r"オンライン|online|zoom|youtube|teams|discord", re.IGNORECASE)
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            # 添字の小さい方を根にする（結果が入力の順序だけで決まるように）
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+class NearDuplicateDetector:
+    """
+    同じ勉強会が別のイベントとして複数掲載されたもの（グループごと・オンライン/現地ごとの掲載、
+    編集後の再掲載など）を見つけて、1件にまとめる。
+
+    タイトルは正規化（NFKC・小文字化・IGNORE_WORDS と記号の除去）してから文字の3-gramにし、
+    MinHash（1回のハッシュでビンに振り分ける One Permutation Hashing）の署名を LSH のバンドに分ける。
+    同じバケットに入るのは、開催日とタイトル中の数字（「第12回」と「第13回」は別のイベント）が同じで、
+    署名のバンドが一致したイベントだけなので、全ペアを比べずに候補を絞れる
+    （1件だけのブロックは署名も作らず、PAIRWISE_MAX 件以下の小さいブロックは全ペアを直接比べる）。
+    候補は 3-gram の Jaccard 係数と開始時刻の差で確かめ、Union-Find でまとめたクラスタからは
+    最も古い掲載（event_id が最小）を残す。
+    主催者が違う場合は類似度の基準を厳しくしたうえで、同じ会場（住所・場所名が同じ。オンライン同士は
+    会場が同じとはみなさない）か、タイトルが1つの勉強会を特定できる長さ（min_title_length_other_owner 文字以上）の
+    ときだけまとめる（「もくもく会」「LT会」のようなよくあるタイトルの別の勉強会を1件にしないため）。
+    """
+
+    PAIRWISE_MAX = 8
+
+    def __init__(self, similarity=0.6, similarity_other_owner=0.8, max_start_diff_minutes=30,
+                 ignore_words=(), num_bins=16, bands=8, min_title_length_other_owner=15):
+        if num_bins % bands:
+            raise ValueError("num_bins は bands で割り切れる数にしてください")
+        self.similarity = similarity
+        self.similarity_other_owner = similarity_other_owner
+        self.max_start_diff = max_start_diff_minutes * 60
+        self.min_title_length_other_owner = min_title_length_other_owner
+        self.ignore_words = sorted((unicodedata.normalize("NFKC", w).lower() for w in ignore_words), key=len, reverse=True)
+        self.num_bins = num_bins
+        self.bands = bands
+        self.rows = num_bins // bands
+
+    def normalize_title(self, title):
+        """比較用のタイトル（NFKC・小文字化し、IGNORE_WORDS と空白・記号を除いたもの）"""
+        text = unicodedata.normalize("NFKC", title or "").lower()
+        for word in self.ignore_words:
+            text = text.replace(word, " ")
+        return _NON_WORD.sub("", text)
+
+    @staticmethod
+    def shingles(text, size=3):
+        if len(text) <= size:
+            return {text}
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    def signature(self, shingles):
+        """
+        MinHash の署名（長さ num_bins）。
+
+        各 3-gram を1回だけハッシュし、ハッシュ値でビンを選んでビンごとの最小値を取る。
+        空のビンは右隣の空でないビンの値を距離に応じてずらして埋める（rotation による densification）。
+        """
+        k = self.num_bins
+        bins = [None] * k
+        for shingle in shingles:
+            h = zlib.crc32(shingle.encode("utf-8"))
+            b, value = h % k, h // k
+            if bins[b] is None or value < bins[b]:
+                bins[b] = value
+        if None in bins:
+            offset = (1 << 32) // k + 1
+            filled = [b for b in range(k) if bins[b] is not None]
+            for b in range(k):
+                if bins[b] is None:
+                    j = bisect_right(filled, b)
+                    nearest = filled[j] if j < len(filled) else filled[0] + k
+                    bins[b] = bins[nearest % k] + (nearest - b) * offset
+        return bins
+
+    def clusters(self, events):
+        """重複とみなしたイベントの添字のクラスタ（2件以上のもの）のリストを返す"""
+        titles = [self.normalize_title(ev.title) for ev in events]
+        shingles = [self.shingles(title) for title in titles]
+
+        blocks = {}
+        for idx, ev in enumerate(events):
+            if ev.started_at is None or not titles[idx]:
+                continue
+            blocks.setdefault((ev.date, tuple(_NUMBER.findall(titles[idx]))), []).append(idx)
+
+        candidates = []
+        for block, members in blocks.items():
+            if len(members) < 2:
+                continue
+            if len(members) <= self.PAIRWISE_MAX:
+                candidates.append(members)
+                continue
+            buckets = {}
+            for idx in members:
+                sig = self.signature(shingles[idx])
+                for band in range(self.bands):
+                    buckets.setdefault((band, tuple(sig[band * self.rows:(band + 1) * self.rows])), []).append(idx)
+            candidates.extend(bucket for bucket in buckets.values() if len(bucket) > 1)
+
+        uf = _UnionFind(len(events))
+        checked = set()
+        for members in candidates:
+            for pos, i in enumerate(members):
+                for j in members[pos + 1:]:
+                    if (i, j) in checked or uf.find(i) == uf.find(j):
+                        continue
+                    checked.add((i, j))
+                    if self._is_duplicate(events[i], events[j], titles[i], titles[j], shingles[i], shingles[j]):
+                        uf.union(i, j)
+
+        groups = {}
+        for idx in range(len(events)):
+            groups.setdefault(uf.find(idx), []).append(idx)
+        return [members for members in groups.values() if len(members) > 1]
+
+    def _is_duplicate(self, a, b, title_a, title_b, shingles_a, shingles_b):
+        if abs((a.started_at - b.started_at).total_seconds()) > self.max_start_diff:
+            return False
+        same_owner = bool(a.owner) and a.owner == b.owner
+        if not same_owner and not (
+            _same_venue(a, b) or min(len(title_a), len(title_b)) >= self.min_title_length_other_owner
+        ):
+            return False
+        threshold = self.similarity if same_owner else self.similarity_other_owner
+        return len(shingles_a & shingles_b) / len(shingles_a | shingles_b) >= threshold
+
+    def dedup(self, events):
+        """
+        (残すイベントのリスト, クラスタのリスト) を返す。
+
+        残すイベントは元の順序のまま。クラスタは (残したイベント, まとめたイベントのリスト)。
+        """
+        events = list(events)
+        removed = set()
+        clusters = []
+        for members in self.clusters(events):
+            keep = min(members, key=lambda idx: _id_order(events[idx].event_id))
+            clusters.append((events[keep], [events[idx] for idx in members if idx != keep]))
+            removed.update(idx for idx in members if idx != keep)
+        return [ev for idx, ev in enumerate(events) if idx not in removed], clusters
+
+
+def _venue_key(ev):
+    """会場の比較用の値（オンライン・不明なら None。オンラインの掲載は会場からは同じ勉強会と判断できない）"""
+    if _ONLINE.search(f"{ev.place or ''} {ev.address or ''}"):
+        return None
+    key = _NON_WORD.sub("", unicodedata.normalize("NFKC", ev.address or ev.place or "").lower())
+    return key or None
+
+
+def _same_venue(a, b):
+    key = _venue_key(a)
+    return key is not None and key == _venue_key(b)
+
+
+def _id_order(event_id):
+    """event_id の並び順（数値の id は数値として比べる）"""
+    try:
+        return 0, int(event_id), ""
+    except (TypeError, ValueError):
+        return 1, 0, str(event_id)
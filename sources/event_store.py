@@ -0,0 +1,76 @@
+import time
+from pathlib import Path
+
+from .db import connect
+
+
+class EventStore:
+    """
+    通知済みイベントを記録する SQLite のストア。
+
+    (source, event_id) ごとに最後に通知したときの updated_at と内容のハッシュを持ち、
+    今回取得したイベントが新規・変更あり・変更なしのどれかを内容のハッシュで判定する
+    （updated_at は記録するだけで判定には使わない）。
+    """
+
+    NEW = "new"
+    CHANGED = "changed"
+
+    def __init__(self, path, retention_days=90):
+        self.path = Path(path)
+        self.retention_days = retention_days
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " source TEXT NOT NULL, event_id TEXT NOT NULL,"
+                " updated_at TEXT, content_hash TEXT NOT NULL, notified_at REAL NOT NULL,"
+                " PRIMARY KEY (source, event_id))"
+            )
+
+    def diff(self, source, items):
+        """
+        items: (event_id, updated_at, content_hash) のリスト。
+        event_id -> NEW / CHANGED / None（前回通知から変化なし）の dict を返す。
+        """
+        return self.diff_many({source: items})[source]
+
+    def diff_many(self, items_by_source):
+        """source -> items の dict を受け取り、source -> diff() の結果 を1回の接続で求める"""
+        results = {}
+        with connect(self.path) as conn:
+            for source, items in items_by_source.items():
+                known = dict(conn.execute("SELECT event_id, content_hash FROM events WHERE source = ?", (source,)))
+                result = {}
+                for event_id, _updated_at, content_hash in items:
+                    event_id = str(event_id)
+                    if event_id not in known:
+                        result[event_id] = self.NEW
+                    else:
+                        # 申込の増減（満席になった・定員が変わった）は updated_at を変えないので、常にハッシュで比べる
+                        result[event_id] = self.CHANGED if known[event_id] != content_hash else None
+                results[source] = result
+        return results
+
+    def notified_state(self, source, items):
+        """
+        mark_notified(source, items) をあとで行うための JSON にできる値。
+
+        アウトボックスに保存し、再送したメッセージが送れたときに mark_notified_state() で記録する。
+        """
+        return {"path": str(self.path), "source": source, "items": [list(item) for item in items]}
+
+    def mark_notified(self, source, items):
+        """通知したイベントの状態を記録し、保持期間を過ぎたものを削除する"""
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)",
+                [(source, str(event_id), updated_at, content_hash, now) for event_id, updated_at, content_hash in items],
+            )
+            conn.execute("DELETE FROM events WHERE notified_at < ?", (now - self.retention_days * 86400,))
+
+
+def mark_notified_state(state):
+    """EventStore.notified_state() で作った値の記録を行う"""
+    EventStore(state["path"]).mark_notified(state["source"], [tuple(item) for item in state["items"]])
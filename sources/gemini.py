@@ -0,0 +1,60 @@
+import os
+import sys
+import threading
+
+import config
+
+
+# google-generativeaiのインポート時のエラーメッセージを抑制
+# エラーメッセージはprintで出力されるため、stdout/stderrを一時的にリダイレクト
+class SuppressOutput:
+    def __init__(self):
+        self.stdout = sys.stdout
+        self.stderr = sys.stderr
+        
+    def __enter__(self):
+        sys.stdout = open(os.devnull, 'w')
+        sys.stderr = open(os.devnull, 'w')
+        return self
+        
+    def __exit__(self, *args):
+        sys.stdout.close()
+        sys.stderr.close()
+        sys.stdout = self.stdout
+        sys.stderr = self.stderr
+
+
+_genai = None
+_lock = threading.Lock()
+
+
+def load_genai():
+    """
+    google.generativeai を初めて必要になった時点でインポートして返す。
+
+    SDKのインポートは重いため、Gemini を使わない実行（connpass のみなど）では読み込まない。
+    インポートできなければ None を返す。
+    """
+    global _genai
+    with _lock:
+        if _genai is None:
+            with SuppressOutput():
+                try:
+                    import google.generativeai as genai
+                except Exception:
+                    return None
+            _genai = genai
+        return _genai
+
+
+def create_model():
+    """GEMINI_API_KEY があれば GenerativeModel を作って返す。使えなければ None"""
+    if not getattr(config, "GEMINI_API_KEY", None):
+        print("Warning: GEMINI_API_KEY is not set.")
+        return None
+    genai = load_genai()
+    if genai is None:
+        print("Warning: google-generativeai をインポートできません。")
+        return None
+    genai.configure(api_key=config.GEMINI_API_KEY)
+    return genai.GenerativeModel(config.GEMINI_CONFIG["MODEL"])
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+import requests
+
+import config
+from . import http_client
+from .metrics import get_metrics
+
+
+class CachedResponse:
+    """
+    HttpCache.get の戻り値。requests.Response と同じ感覚で使えるようにしている。
+
+    from_cache   : TTL内のためネットワークに出ずキャッシュから返した
+    not_modified : 条件付きリクエストで 304 が返り、キャッシュ本文を返した
+    """
+
+    def __init__(self, url, status_code, content, headers, encoding, cache_key,
+                 from_cache=False, not_modified=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding or "utf-8"
+        self.cache_key = cache_key
+        self.from_cache = from_cache
+        self.not_modified = not_modified
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    @property
+    def body_hash(self):
+        return hashlib.sha256(self.content).hexdigest()
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class HttpCache:
+    """
+    ETag / Last-Modified を使った条件付きリクエスト対応のディスクキャッシュ。
+
+    1エントリは <key>.json（メタ情報）と <key>.body（本文）の2ファイル。
+    TTL内ならネットワークに出ず、TTL切れなら If-None-Match / If-Modified-Since 付きで
+    問い合わせて 304 ならキャッシュの本文を返す。合計サイズが max_bytes を超えたら
+    最終利用が古いエントリから削除する。
+    """
+
+    def __init__(self, directory, ttl_seconds, max_bytes):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _key(self, url, params):
+        query = urlencode(sorted((params or {}).items()))
+        return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+    def _path(self, key, suffix):
+        return self.directory / f"{key}{suffix}"
+
+    def _write_atomic(self, path, data):
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _load_meta(self, key):
+        try:
+            meta = json.loads(self._path(key, ".json").read_text(encoding="utf-8"))
+            body = self._path(key, ".body").read_bytes()
+            return meta, body
+        except (OSError, ValueError):
+            return None, None
+
+    def _save_meta(self, key, meta):
+        self._write_atomic(self._path(key, ".json"), json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    def get(self, url, params=None, headers=None, timeout=10, ttl=None, throttle=None):
+        """
+        キャッシュを通して GET する。200 以外（304を除く）はキャッシュせずそのまま返す。
+        通信は共有セッション（http_client）経由で、429 / 5xx はリトライされる。
+        throttle を渡すと、実際にネットワークへ出る直前にだけ呼ばれる（レート制限用）。
+        """
+        ttl = self.ttl_seconds if ttl is None else ttl
+        host = urlsplit(url).netloc
+        key = self._key(url, params)
+        meta, body = self._load_meta(key)
+        now = time.time()
+
+        if meta and now - meta["stored_at"] < ttl:
+            meta["last_used"] = now
+            self._save_meta(key, meta)
+            get_metrics().incr("http_cache_total", host=host, result="fresh")
+            return CachedResponse(url, 200, body, meta["headers"], meta["encoding"], key, from_cache=True)
+
+        request_headers = dict(headers or {})
+        if meta:
+            if meta["headers"].get("ETag"):
+                request_headers["If-None-Match"] = meta["headers"]["ETag"]
+            if meta["headers"].get("Last-Modified"):
+                request_headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+        res = http_client.request(
+            "GET", url, params=params, headers=request_headers, timeout=timeout, throttle=throttle
+        )
+
+        if res.status_code == 304 and meta:
+            meta["stored_at"] = meta["last_used"] = now
+            self._save_meta(key, meta)
+            get_metrics().incr("http_cache_total", host=host, result="revalidated")
+            return CachedResponse(url, 200, body, meta["headers"], meta["encoding"], key, not_modified=True)
+
+        get_metrics().incr("http_cache_total", host=host, result="miss")
+        response = CachedResponse(url, res.status_code, res.content, dict(res.headers), res.encoding, key)
+        if res.status_code == 200:
+            self._store(key, response, now)
+        return response
+
+    def _store(self, key, response, now):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._write_atomic(self._path(key, ".body"), response.content)
+        self._save_meta(key, {
+            "url": response.url,
+            "stored_at": now,
+            "last_used": now,
+            "encoding": response.encoding,
+            "headers": {
+                name: response.headers[name]
+                for name in ("ETag", "Last-Modified", "Content-Type")
+                if name in response.headers
+            },
+        })
+        self._evict()
+
+    def memoize(self, response, name, func):
+        """
+        本文から導出した値（パース結果など）をキャッシュする。
+
+        本文のハッシュが前回と同じなら func を呼ばずに保存済みの値を返すので、
+        304 や TTL内のレスポンスで同じHTMLを何度もパースしなくて済む。値はJSON化できること。
+        """
+        path = self._path(response.cache_key, f".{name}.derived")
+        body_hash = response.body_hash
+        try:
+            saved = json.loads(path.read_text(encoding="utf-8"))
+            if saved["body_hash"] == body_hash:
+                get_metrics().incr("parse_cache_total", parser=name, result="hit")
+                return saved["value"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        get_metrics().incr("parse_cache_total", parser=name, result="miss")
+        value = func(response.text)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._write_atomic(path, json.dumps({"body_hash": body_hash, "value": value}, ensure_ascii=False).encode("utf-8"))
+        return value
+
+    def _evict(self):
+        """合計サイズが上限を超えていれば、最終利用の古いエントリから削除する"""
+        with self._lock:
+            groups = {}
+            for path in self.directory.iterdir():
+                if path.name.endswith(".tmp"):
+                    continue
+                groups.setdefault(path.name.split(".", 1)[0], []).append(path)
+
+            entries = []
+            total = 0
+            for key, files in groups.items():
+                size = sum(p.stat().st_size for p in files)
+                try:
+                    last_used = json.loads(self._path(key, ".json").read_text(encoding="utf-8")).get("last_used", 0)
+                except (OSError, ValueError):
+                    last_used = 0
+                entries.append((last_used, size, files))
+                total += size
+
+            for _, size, files in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                for p in files:
+                    try:
+                        p.unlink()
+                    except OSError:
+                        pass
+                total -= size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    """全ソースで共有する HttpCache を返す"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            cfg = config.HTTP_CACHE_CONFIG
+            _cache = HttpCache(cfg["DIR"], cfg["TTL_SECONDS"], cfg["MAX_BYTES"])
+        return _cache
@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError
+
+import config
+from .metrics import get_metrics
+
+
+class RetryPolicy:
+    """
+    指数バックオフ＋ジッターのリトライ方針。
+
+    429 で Retry-After ヘッダーがあればその秒数（または日時）まで待つ（上限 retry_after_max）。
+    それ以外は backoff_base * 2^attempt を上限 backoff_max で打ち切り、
+    0〜その値の一様乱数だけ待つ（full jitter）。
+
+    POST など冪等でないメソッドは、既定では相手が受け取っていないと分かる場合（接続できなかった・429・503）だけリトライする。
+    読み取りのタイムアウトは、相手が処理を終えている（Slack に投稿済みなど）かもしれないので再送しない。
+    non_idempotent_statuses を渡すと、冪等でないメソッドでもそのステータスはリトライする（まれな二重送信を許す場合）。
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    NON_IDEMPOTENT_RETRY_STATUSES = (429, 503)
+    IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+    def __init__(self, max_retries=None, backoff_base=None, backoff_max=None, non_idempotent_statuses=None):
+        cfg = config.HTTP_CONFIG
+        self.max_retries = cfg["MAX_RETRIES"] if max_retries is None else max_retries
+        self.backoff_base = cfg["BACKOFF_BASE"] if backoff_base is None else backoff_base
+        self.backoff_max = cfg["BACKOFF_MAX"] if backoff_max is None else backoff_max
+        self.retry_after_max = cfg["RETRY_AFTER_MAX"]
+        self.non_idempotent_statuses = (
+            self.NON_IDEMPOTENT_RETRY_STATUSES if non_idempotent_statuses is None else tuple(non_idempotent_statuses)
+        )
+
+    def should_retry(self, attempt, response=None, error=None, method="GET"):
+        if attempt >= self.max_retries:
+            return False
+        idempotent = method.upper() in self.IDEMPOTENT_METHODS
+        if error is not None:
+            if idempotent:
+                return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+            return _is_connect_error(error)
+        if idempotent:
+            return response.status_code in self.RETRY_STATUSES
+        return response.status_code in self.non_idempotent_statuses
+
+    def delay(self, attempt, response=None):
+        if response is not None and response.status_code == 429:
+            retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.retry_after_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _parse_retry_after(value):
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def _is_connect_error(error):
+    """リクエストを送り始める前の失敗（接続できなかった）か"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ReadTimeout):
+        return False
+    # 送信後に接続が切れた場合（Connection aborted）も ConnectionError になるので除く
+    return isinstance(error, requests.exceptions.ConnectionError) and not any(
+        isinstance(arg, ProtocolError) for arg in error.args
+    )
+
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots = {}
+
+
+def get_session():
+    """全ソースで共有する requests.Session（Keep-Alive・コネクションプール付き）を返す"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            cfg = config.HTTP_CONFIG
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=cfg["POOL_CONNECTIONS"], pool_maxsize=cfg["POOL_MAXSIZE"])
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _host_slot(url):
+    """ホストごとの同時接続数を制限するセマフォ"""
+    host = urlsplit(url).netloc
+    with _session_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(config.HTTP_CONFIG["MAX_PER_HOST"])
+        return _host_slots[host]
+
+
+def request(method, url, retry=None, throttle=None, **kwargs):
+    """
+    共有セッションでリクエストを送る。
+
+    RetryPolicy に従って 429 / 5xx / 接続エラーをリトライし（POST などは再送しても安全なものだけ）、最後のレスポンスを返す
+    （ステータスの判定は呼び出し側で行う）。throttle は各試行の直前に呼ばれる。
+    """
+    retry = retry or RetryPolicy()
+    session = get_session()
+    slot = _host_slot(url)
+    host = urlsplit(url).netloc
+    metrics = get_metrics()
+    if isinstance(kwargs.get("data"), (str, bytes)):
+        sent_bytes = len(kwargs["data"].encode("utf-8") if isinstance(kwargs["data"], str) else kwargs["data"])
+    else:
+        sent_bytes = 0
+
+    attempt = 0
+    while True:
+        if throttle:
+            throttle()
+        try:
+            with slot, metrics.timer("http_request_seconds", host=host, method=method):
+                response = session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            metrics.incr("http_requests_total", host=host, method=method, status="error")
+            if not retry.should_retry(attempt, error=e, method=method):
+                raise
+            wait_time = retry.delay(attempt)
+            print(f"   ⚠️  {method} {host} 接続エラー: {wait_time:.1f}秒後にリトライします ({attempt + 1}/{retry.max_retries}): {e}")
+        else:
+            metrics.incr("http_requests_total", host=host, method=method, status=response.status_code)
+            metrics.incr("http_sent_bytes_total", sent_bytes, host=host)
+            metrics.incr("http_received_bytes_total", len(response.content), host=host)
+            if not retry.should_retry(attempt, response=response, method=method):
+                return response
+            wait_time = retry.delay(attempt, response)
+            print(f"   ⚠️  {method} {host} ステータス {response.status_code}: {wait_time:.1f}秒後にリトライします ({attempt + 1}/{retry.max_retries})")
+        metrics.incr("http_retries_total", host=host, method=method)
+        metrics.observe("http_retry_wait_seconds", wait_time, host=host)
+        time.sleep(wait_time)
+        attempt += 1
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+class Metrics:
+    """
+    1回の実行分の計測値（カウンターと所要時間）を集める。
+
+    値は「メトリクス名 + ラベル」ごとに持つ。ラベルには source（ソース名）、stage（処理段階）、
+    host（通信先）などを付ける。複数スレッドから同時に記録してよい。
+    実行の最後に JSON（と必要なら Prometheus のテキスト形式）でファイルに書き出す。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+        self.started_at = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def reset(self):
+        """記録した値を消して計測を最初からやり直す"""
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+            self.started_at = time.time()
+
+    def incr(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            count, total, longest = self._timers.get(key, (0, 0.0, 0.0))
+            self._timers[key] = (count + 1, total + seconds, max(longest, seconds))
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """with ブロックの所要時間を name に記録する（例外で抜けても記録する）"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def stage(self, source, stage):
+        """ソースの処理段階（http_fetch, parse, filter, llm, render など）の所要時間を計る"""
+        return self.timer("stage_seconds", source=source, stage=stage)
+
+    def snapshot(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            timers = sorted(self._timers.items())
+        return {
+            "started_at": datetime.fromtimestamp(self.started_at).astimezone().isoformat(),
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in counters
+            ],
+            "timers": [
+                {"name": name, "labels": dict(labels), "count": count,
+                 "sum": round(total, 6), "max": round(longest, 6)}
+                for (name, labels), (count, total, longest) in timers
+            ],
+        }
+
+    def to_prometheus(self, prefix="eventbot_"):
+        """Prometheus のテキスト形式（カウンターは counter、所要時間は summary の _sum / _count と _max）"""
+        snapshot = self.snapshot()
+        lines = []
+
+        def series(metric, labels, value):
+            label_text = ",".join(
+                '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                for k, v in labels.items()
+            )
+            return f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}"
+
+        for name in dict.fromkeys(item["name"] for item in snapshot["counters"]):
+            lines.append(f"# TYPE {prefix}{name} counter")
+            for item in snapshot["counters"]:
+                if item["name"] == name:
+                    lines.append(series(prefix + name, item["labels"], item["value"]))
+
+        for name in dict.fromkeys(item["name"] for item in snapshot["timers"]):
+            items = [item for item in snapshot["timers"] if item["name"] == name]
+            lines.append(f"# TYPE {prefix}{name} summary")
+            for item in items:
+                lines.append(series(f"{prefix}{name}_sum", item["labels"], item["sum"]))
+                lines.append(series(f"{prefix}{name}_count", item["labels"], item["count"]))
+            lines.append(f"# TYPE {prefix}{name}_max gauge")
+            for item in items:
+                lines.append(series(f"{prefix}{name}_max", item["labels"], item["max"]))
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory, run=None, prometheus=False):
+        """
+        directory に metrics-<開始時刻>.json を書き出してパスを返す。
+
+        run には実行全体の情報（ソースごとの結果や合計時間）を渡す。
+        prometheus=True なら同じ名前の .prom も書き出す。
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = "metrics-" + datetime.fromtimestamp(self.started_at).strftime("%Y%m%d-%H%M%S")
+        path = directory / f"{stem}.json"
+        data = {"run": run or {}, **self.snapshot()}
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        if prometheus:
+            (directory / f"{stem}.prom").write_text(self.to_prometheus(), encoding="utf-8")
+        return path
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """全ソースで共有する Metrics を返す"""
+    return _metrics
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from .db import connect
+
+
+class Outbox:
+    """
+    Slack に送るメッセージを送信前に保存しておく SQLite のアウトボックス。
+
+    送信できたら delivered_at を記録し、送れなかったものは次回の実行の最初に再送する。
+    キーは「Webhook + メッセージ内容」のハッシュ（冪等キー）で、同じメッセージが
+    dedup_seconds 以内に送信済みなら二重に投稿しない。
+    Webhook の URL は秘密情報なので保存せず、ハッシュ（webhook_id）だけを持つ。
+    通知したイベントの記録（EventStore に書くもの）は state としてペイロードの最後のメッセージに持たせ、
+    再送で送れたときに記録できるようにする（記録しないと次の取得で同じイベントを再び通知してしまう）。
+    """
+
+    def __init__(self, path, dedup_seconds, max_age_seconds, retention_days=7):
+        self.path = Path(path)
+        self.dedup_seconds = dedup_seconds
+        self.max_age_seconds = max_age_seconds
+        self.retention_days = retention_days
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " key TEXT PRIMARY KEY, webhook_id TEXT NOT NULL, source TEXT,"
+                " payload TEXT NOT NULL, created_at REAL NOT NULL, delivered_at REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT, state TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+            if "state" not in columns:
+                conn.execute("ALTER TABLE messages ADD COLUMN state TEXT")
+
+    @staticmethod
+    def webhook_id(webhook_url):
+        return hashlib.sha256(webhook_url.encode("utf-8")).hexdigest()[:16]
+
+    def key(self, webhook_url, message):
+        raw = f"{self.webhook_id(webhook_url)}|{json.dumps(message, ensure_ascii=False, sort_keys=True)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def add(self, webhook_url, source, messages, state=None):
+        """
+        メッセージを未送信として保存し、送る必要のある (key, message) のリストを返す。
+
+        dedup_seconds 以内に送信済みのものは返さない。未送信のまま残っているものは
+        作り直さずにそのまま使う（再送と今回の送信が重なっても1通になる）。
+        state（JSON にできる値）は最後のメッセージに保存する。
+        """
+        now = time.time()
+        webhook_id = self.webhook_id(webhook_url)
+        entries = []
+        with connect(self.path) as conn:
+            for i, message in enumerate(messages):
+                key = self.key(webhook_url, message)
+                row = conn.execute("SELECT delivered_at FROM messages WHERE key = ?", (key,)).fetchone()
+                if row and row[0] is not None and row[0] >= now - self.dedup_seconds:
+                    continue
+                if row is None or row[0] is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO messages (key, webhook_id, source, payload, created_at)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (key, webhook_id, source, json.dumps(message, ensure_ascii=False), now),
+                    )
+                if state is not None and i == len(messages) - 1:
+                    conn.execute(
+                        "UPDATE messages SET state = ? WHERE key = ?", (json.dumps(state, ensure_ascii=False), key)
+                    )
+                entries.append((key, message))
+        return entries
+
+    def is_pending(self, key):
+        with connect(self.path) as conn:
+            row = conn.execute("SELECT delivered_at FROM messages WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] is None
+
+    def mark_delivered(self, key):
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute(
+                "UPDATE messages SET delivered_at = ?, attempts = attempts + 1, last_error = NULL WHERE key = ?",
+                (now, key),
+            )
+            conn.execute(
+                "DELETE FROM messages WHERE delivered_at < ?", (now - self.retention_days * 86400,)
+            )
+
+    def delivered_states(self, keys):
+        """keys のうち送信済みのメッセージに保存された state のリスト"""
+        with connect(self.path) as conn:
+            rows = [
+                conn.execute(
+                    "SELECT state FROM messages WHERE key = ? AND delivered_at IS NOT NULL AND state IS NOT NULL", (key,)
+                ).fetchone()
+                for key in keys
+            ]
+        return [json.loads(row[0]) for row in rows if row]
+
+    def mark_failed(self, key, error):
+        with connect(self.path) as conn:
+            conn.execute(
+                "UPDATE messages SET attempts = attempts + 1, last_error = ? WHERE key = ?",
+                (str(error)[:500], key),
+            )
+
+    def pending(self):
+        """
+        未送信のメッセージを保存した順に (key, webhook_id, source, message) のリストで返す。
+        max_age_seconds より古いもの（もう意味のない通知）は削除する。
+        """
+        with connect(self.path) as conn:
+            expired = conn.execute(
+                "DELETE FROM messages WHERE delivered_at IS NULL AND created_at < ?",
+                (time.time() - self.max_age_seconds,),
+            ).rowcount
+            rows = conn.execute(
+                "SELECT key, webhook_id, source, payload FROM messages"
+                " WHERE delivered_at IS NULL ORDER BY created_at, rowid"
+            ).fetchall()
+        if expired:
+            print(f"   🗑️  期限切れの未送信メッセージを {expired}件 破棄しました")
+        return [(key, webhook_id, source, json.loads(payload)) for key, webhook_id, source, payload in rows]
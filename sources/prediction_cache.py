@@ -0,0 +1,68 @@
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+from .db import connect
+
+
+class PredictionCache:
+    """
+    Gemini の混雑予測結果を SQLite に保存するキャッシュ。
+
+    キーは「会場 + 正規化したイベント名 + 開演時間」で、同じ公演が複数日続く場合も1回の予測で済む。
+    namespace（モデル名とプロンプトのバージョン）が変わったら古いエントリは使わずに削除する。
+    """
+
+    def __init__(self, path, namespace, ttl_seconds, max_entries):
+        self.path = Path(path)
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " key TEXT PRIMARY KEY, namespace TEXT NOT NULL,"
+                " title TEXT, start_time TEXT, prediction TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            # モデルやプロンプトが変わった古い予測は無効
+            conn.execute("DELETE FROM predictions WHERE namespace != ?", (namespace,))
+
+    @staticmethod
+    def normalize_title(title):
+        text = unicodedata.normalize("NFKC", title or "").lower()
+        return re.sub(r"\s+", " ", text).strip()
+
+    def _key(self, title, start_time, venue=""):
+        raw = f"{self.namespace}|{venue or ''}|{self.normalize_title(title)}|{(start_time or '').strip()}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, title, start_time, venue=""):
+        """TTL内の予測があれば返す。なければ None"""
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT prediction FROM predictions WHERE key = ? AND created_at >= ?",
+                (self._key(title, start_time, venue), time.time() - self.ttl_seconds),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, title, start_time, prediction, venue=""):
+        """予測を保存し、期限切れと上限超過分を削除する"""
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self._key(title, start_time, venue), self.namespace, title, start_time,
+                    json.dumps(prediction, ensure_ascii=False), now,
+                ),
+            )
+            conn.execute("DELETE FROM predictions WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM predictions WHERE key NOT IN"
+                " (SELECT key FROM predictions ORDER BY created_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
@@ -0,0 +1,137 @@
+import heapq
+import re
+import unicodedata
+from datetime import datetime
+
+from .base import JST
+
+_ASCII_WORD = re.compile(r"[a-z0-9][a-z0-9+#]*")
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+")
+
+# フィールドごとの重み（タイトルでの一致を説明文での一致より重く見る）
+FIELD_WEIGHTS = {"title": 1.0, "summary": 0.5}
+
+
+def tokenize(text):
+    """
+    検索用のトークンに分ける。
+
+    英数字は単語単位（小文字）、日本語は文字の2-gram（1文字だけなら1-gram）にする。
+    分かち書きの辞書がなくても「データ分析」と「データ分析勉強会」のような部分一致を拾える。
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    tokens = set(_ASCII_WORD.findall(text))
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.add(run)
+        else:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class RankingIndex:
+    """
+    イベントのタイトル・説明文の転置インデックスと、それを使った関連度順の並べ替え。
+
+    インデックスは取得したイベント全体に対して一度だけ作り、キーワードの一致は
+    キーワードのトークンのポスティングリストだけを辿って数える（一致しないイベントは見ない）。
+    スコアは キーワード一致・開催地・開催日の近さ・申込率（accepted / limit）の重み付き和。
+    rank() に events を渡すと、そのうちのイベントだけを並べる（購読者ごとの並べ替えでもインデックスは作り直さない）。
+    """
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.positions = {ev.event_id: idx for idx, ev in enumerate(self.events)}
+        # イベントごとに決まる値は前もって求めておく（購読者ごとの rank() ではイベントを読み直さない）
+        self.places = [unicodedata.normalize("NFKC", f"{ev.address or ''} {ev.place or ''}") for ev in self.events]
+        self.starts = [ev.started_at.timestamp() if ev.started_at else None for ev in self.events]
+        self.fills = [min(1.0, (ev.accepted or 0) / ev.limit) if ev.limit else 0.0 for ev in self.events]
+        self.full = [1.0 if ev.is_full else 0.0 for ev in self.events]
+        self._location_hits = {}  # 開催地の組 -> 該当するイベントの添字の集合
+        self.postings = {}  # トークン -> {イベントの添字: フィールドの重みの最大値}
+        for idx, ev in enumerate(self.events):
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(getattr(ev, field)):
+                    docs = self.postings.setdefault(token, {})
+                    if docs.get(idx, 0) < weight:
+                        docs[idx] = weight
+
+    def covers(self, events):
+        """events がすべてこのインデックスに含まれているか"""
+        return all(ev.event_id in self.positions for ev in events)
+
+    def location_hits(self, locations):
+        """開催場所・住所に locations のどれかを含むイベントの添字の集合（同じ組は使い回す）"""
+        key = tuple(unicodedata.normalize("NFKC", loc) for loc in locations)
+        hits = self._location_hits.get(key)
+        if hits is None:
+            hits = self._location_hits[key] = {
+                idx for idx, place in enumerate(self.places) if any(loc in place for loc in key)
+            }
+        return hits
+
+    def keyword_scores(self, keywords, subset=None):
+        """
+        イベントの添字 -> キーワード一致のスコア。
+
+        キーワードごとに「トークンがどれだけ含まれているか（タイトル1.0・説明文0.5）」の割合を求め、
+        全キーワード分を足す。一致するトークンが1つもないイベントは含まれない。
+        subset（添字の集合）を渡すとその中だけを数える（ポスティングリストより小さければ subset の側から引く）。
+        """
+        scores = {}
+        for keyword in keywords:
+            tokens = tokenize(keyword)
+            if not tokens:
+                continue
+            coverage = {}
+            for token in tokens:
+                docs = self.postings.get(token, {})
+                if subset is None:
+                    matched = docs.items()
+                elif len(subset) < len(docs):
+                    matched = ((idx, docs[idx]) for idx in subset if idx in docs)
+                else:
+                    matched = ((idx, weight) for idx, weight in docs.items() if idx in subset)
+                for idx, weight in matched:
+                    coverage[idx] = coverage.get(idx, 0.0) + weight
+            for idx, total in coverage.items():
+                scores[idx] = scores.get(idx, 0.0) + total / len(tokens)
+        return scores
+
+    def rank(self, keywords, locations, weights, days_ahead, top_n=None, now=None, events=None):
+        """
+        スコアの高い順に top_n 件の Event を返す（top_n が None なら全件）。
+
+        events を渡すと、インデックス中のそのイベント（event_id で対応付ける）だけを並べ、渡された Event を返す。
+        """
+        now = now or datetime.now(JST)
+        if events is None:
+            candidates = list(enumerate(self.events))
+            keyword_scores = self.keyword_scores(keywords)
+        else:
+            candidates = [(self.positions[ev.event_id], ev) for ev in events]
+            keyword_scores = self.keyword_scores(keywords, {idx for idx, _ in candidates})
+        location_hits = self.location_hits(locations)
+        now_ts = now.timestamp()
+        horizon = max(1.0, days_ahead * 86400.0)
+        starts, fills, full = self.starts, self.fills, self.full
+        w_keyword, w_location, w_date = weights["KEYWORD"], weights["LOCATION"], weights["DATE"]
+        w_fill, w_full = weights["FILL"], weights["FULL"]
+
+        def score(idx):
+            start = starts[idx]
+            proximity = 0.0 if start is None else min(1.0, max(0.0, 1.0 - (start - now_ts) / horizon))
+            return (
+                w_keyword * keyword_scores.get(idx, 0.0)
+                + w_location * (idx in location_hits)
+                + w_date * proximity
+                + w_fill * fills[idx]
+                + w_full * full[idx]
+            )
+
+        scored = ((score(idx), -idx, pos) for pos, (idx, _) in enumerate(candidates))
+        if top_n is None:
+            best = sorted(scored, reverse=True)
+        else:
+            best = heapq.nlargest(top_n, scored)
+        return [candidates[pos][1] for _, _, pos in best]
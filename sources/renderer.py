@@ -0,0 +1,127 @@
+import atexit
+import queue
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+import config
+from .metrics import get_metrics
+
+
+class BrowserRenderer:
+    """
+    JSで描画されるページ用の、使い回せるヘッドレスブラウザ。
+
+    Playwright の sync API は作成したスレッドからしか操作できないため、専用スレッドが
+    ブラウザとコンテキストを保持し、render() はそのスレッドに処理を依頼して結果を待つ。
+    ブラウザは最初の render() で起動し、以降は close() まで起動したままにする。
+    画像・フォント・CSS と解析系ドメインへのリクエストは遮断して描画を軽くする。
+    """
+
+    def __init__(self, blocked_resource_types=None, blocked_hosts=None):
+        cfg = config.RENDERER_CONFIG
+        self.blocked_resource_types = set(blocked_resource_types or cfg["BLOCKED_RESOURCE_TYPES"])
+        self.blocked_hosts = tuple(blocked_hosts or cfg["BLOCKED_HOSTS"])
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def render(self, url, wait_selector=None, timeout_ms=None):
+        """
+        url を描画した後のHTMLを返す。
+
+        wait_selector を指定するとその要素が現れた時点で取得する（networkidle は待たない）。
+        Playwright が使えない・タイムアウトした場合は例外を送出する。
+        """
+        timeout_ms = timeout_ms or config.RENDERER_CONFIG["TIMEOUT_MS"]
+        future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="browser-renderer", daemon=True)
+                self._thread.start()
+            self._jobs.put((url, wait_selector, timeout_ms, future))
+        with get_metrics().timer("render_seconds", host=urlsplit(url).netloc):
+            try:
+                html = future.result()
+            except Exception:
+                get_metrics().incr("render_pages_total", result="error")
+                raise
+        get_metrics().incr("render_pages_total", result="ok")
+        return html
+
+    def close(self):
+        """ブラウザを終了する（起動していなければ何もしない）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._jobs.put(None)
+                self._thread.join(timeout=10)
+            self._thread = None
+
+    def _should_block(self, request):
+        if request.resource_type in self.blocked_resource_types:
+            return True
+        host = urlsplit(request.url).hostname or ""
+        return any(host == h or host.endswith("." + h) for h in self.blocked_hosts)
+
+    def _handle_route(self, route):
+        if self._should_block(route.request):
+            route.abort()
+        else:
+            route.continue_()
+
+    def _worker(self):
+        pw = browser = context = None
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                url, wait_selector, timeout_ms, future = job
+                try:
+                    if context is None:
+                        from playwright.sync_api import sync_playwright
+
+                        pw = sync_playwright().start()
+                        try:
+                            browser = pw.chromium.launch(headless=True)
+                            context = browser.new_context()
+                            context.route("**/*", self._handle_route)
+                        except Exception:
+                            # 起動に失敗したら次の依頼で最初からやり直す
+                            pw.stop()
+                            pw = browser = context = None
+                            raise
+
+                    page = context.new_page()
+                    try:
+                        page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+                        if wait_selector:
+                            page.wait_for_selector(wait_selector, state="attached", timeout=timeout_ms)
+                        future.set_result(page.content())
+                    finally:
+                        page.close()
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            for closer in (context, browser):
+                if closer is not None:
+                    try:
+                        closer.close()
+                    except Exception:
+                        pass
+            if pw is not None:
+                pw.stop()
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """全ソースで共有する BrowserRenderer を返す（プロセス終了時にブラウザを閉じる）"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = BrowserRenderer()
+            atexit.register(_renderer.close)
+        return _renderer
@@ -0,0 +1,236 @@
+import copy
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+import requests
+
+import config
+from . import http_client
+from .metrics import get_metrics
+from .outbox import Outbox
+
+
+def _truncate(text, limit):
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…"
+
+
+def _fit_block(block, cfg):
+    """1ブロックの文字数を Slack の上限に収める"""
+    text = block.get("text")
+    if not isinstance(text, dict) or not isinstance(text.get("text"), str):
+        return block
+    limit = cfg["MAX_HEADER_CHARS"] if block.get("type") == "header" else cfg["MAX_TEXT_CHARS"]
+    if len(text["text"]) <= limit:
+        return block
+    block = copy.deepcopy(block)
+    block["text"]["text"] = _truncate(text["text"], limit)
+    return block
+
+
+def split_payload(payload, max_blocks=None):
+    """
+    ペイロードを Slack の上限（1メッセージ max_blocks ブロック、1セクション3000文字）に収まる
+    複数のペイロードに分ける。
+
+    先頭の header ブロックは各メッセージの先頭に付け直し、2通目以降は「(2/3)」のように番号を付ける。
+    section とその直後の divider は同じメッセージに入れる。
+    """
+    cfg = config.SLACK_CONFIG
+    max_blocks = max_blocks or cfg["MAX_BLOCKS"]
+    blocks = [_fit_block(b, cfg) for b in payload.get("blocks") or []]
+    extra = {k: v for k, v in payload.items() if k != "blocks"}
+    if len(blocks) <= max_blocks:
+        return [dict(extra, blocks=blocks)] if blocks or extra else []
+
+    header = []
+    if blocks[0].get("type") == "header":
+        header = [blocks.pop(0)]
+        if blocks and blocks[0].get("type") == "divider":
+            header.append(blocks.pop(0))
+
+    # divider はその前のブロックとひとまとまりにする
+    units = []
+    for block in blocks:
+        if block.get("type") == "divider" and units:
+            units[-1].append(block)
+        else:
+            units.append([block])
+
+    room = max(2, max_blocks - len(header))
+    chunks = [[]]
+    for unit in units:
+        if chunks[-1] and len(chunks[-1]) + len(unit) > room:
+            chunks.append([])
+        chunks[-1].extend(unit[:room])
+
+    payloads = []
+    for i, chunk in enumerate(chunks, 1):
+        head = copy.deepcopy(header)
+        if head and i > 1:
+            head[0]["text"]["text"] = _truncate(
+                f"{head[0]['text']['text']} ({i}/{len(chunks)})", cfg["MAX_HEADER_CHARS"]
+            )
+        payloads.append(dict(extra, blocks=head + chunk))
+    return payloads
+
+
+class SlackDelivery:
+    """
+    Slack Incoming Webhook への送信キュー。
+
+    Webhook ごとに専用の送信スレッドを持ち、同じ Webhook へのメッセージは順番どおりに
+    min_interval 秒以上あけて送る（Webhook ごとのレート制限は1メッセージ/秒程度）。
+    別々の Webhook への送信は並行して進む。接続できなかった場合と 429（Retry-After）・5xx は RetryPolicy でリトライする
+    （5xx でもまれに投稿済みのことがあるが、通知が届かないよりはよいので再送する。
+    応答のタイムアウトは投稿済みのことが多いので再送せず、次回の実行でアウトボックスから再送する）。
+    outbox を渡すと送信前にメッセージを保存し、送れなかったものを replay() で再送できる。
+    """
+
+    def __init__(self, min_interval=None, timeout=None, outbox=None):
+        cfg = config.SLACK_CONFIG
+        self.min_interval = cfg["MIN_INTERVAL_SECONDS"] if min_interval is None else min_interval
+        self.timeout = timeout or cfg["TIMEOUT"]
+        self.outbox = outbox
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def submit(self, webhook_url, payload, source=None, state=None):
+        """
+        ペイロードを分割して送信キューに入れる。
+
+        Future を返し、結果は (送信できたメッセージ数, 全メッセージ数)。
+        アウトボックス上で送信済みのメッセージは送らずに送信できたものとして数える。
+        state はアウトボックスに保存し、再送で送れたときに replay() の on_delivered に渡す。
+        """
+        messages = split_payload(payload)
+        if self.outbox is None:
+            entries = [(None, message) for message in messages]
+        else:
+            entries = self.outbox.add(webhook_url, source, messages, state=state)
+        if len(messages) > len(entries):
+            get_metrics().incr("slack_messages_total", len(messages) - len(entries), result="deduplicated")
+        return self._enqueue(webhook_url, entries, already_sent=len(messages) - len(entries))
+
+    def send(self, webhook_url, payload, source=None, state=None):
+        """submit して、送信が終わるまで待つ"""
+        return self.submit(webhook_url, payload, source, state).result()
+
+    def replay(self, webhook_urls, on_delivered=None):
+        """
+        アウトボックスに残っている未送信メッセージを再送し、(再送できた数, 未送信だった数) を返す。
+
+        webhook_urls は現在の設定で使われている Webhook の URL。保存されているのはハッシュだけなので、
+        設定から消えた Webhook 宛てのメッセージは送らずに残す。
+        再送できたメッセージに state があれば on_delivered(state) を呼ぶ。
+        """
+        if self.outbox is None:
+            return 0, 0
+        urls = {self.outbox.webhook_id(url): url for url in webhook_urls if url}
+        by_webhook = {}
+        for key, webhook_id, _source, message in self.outbox.pending():
+            by_webhook.setdefault(webhook_id, []).append((key, message))
+
+        total = sum(len(entries) for entries in by_webhook.values())
+        futures = [
+            self._enqueue(urls[webhook_id], entries)
+            for webhook_id, entries in by_webhook.items()
+            if webhook_id in urls
+        ]
+        sent = sum(future.result()[0] for future in futures)
+        if on_delivered is not None:
+            keys = [key for webhook_id, entries in by_webhook.items() if webhook_id in urls for key, _ in entries]
+            for state in self.outbox.delivered_states(keys):
+                on_delivered(state)
+        return sent, total
+
+    def _enqueue(self, webhook_url, entries, already_sent=0):
+        future = Future()
+        if not entries:
+            future.set_result((already_sent, already_sent))
+            return future
+        self._queue_for(webhook_url).put((entries, already_sent, already_sent + len(entries), future))
+        return future
+
+    def _queue_for(self, webhook_url):
+        with self._lock:
+            jobs = self._queues.get(webhook_url)
+            if jobs is None:
+                jobs = self._queues[webhook_url] = queue.Queue()
+                threading.Thread(
+                    target=self._worker, args=(webhook_url, jobs),
+                    name=f"slack-{urlsplit(webhook_url).path[-8:]}", daemon=True,
+                ).start()
+            return jobs
+
+    def _worker(self, webhook_url, jobs):
+        last_sent = 0.0
+        while True:
+            entries, sent, total, future = jobs.get()
+            try:
+                for key, message in entries:
+                    # 再送と今回の送信でキューに同じメッセージが入っていても1回だけ送る
+                    if key is not None and not self.outbox.is_pending(key):
+                        get_metrics().incr("slack_messages_total", result="deduplicated")
+                        sent += 1
+                        continue
+                    wait_time = last_sent + self.min_interval - time.monotonic()
+                    if wait_time > 0:
+                        time.sleep(wait_time)
+                    with get_metrics().timer("slack_send_seconds"):
+                        error = self._post(webhook_url, message)
+                    last_sent = time.monotonic()
+                    get_metrics().incr("slack_messages_total", result="failed" if error is not None else "sent")
+                    if error is not None:
+                        print(f"Error sending to Slack: {error}")
+                        if key is not None:
+                            self.outbox.mark_failed(key, error)
+                        break
+                    sent += 1
+                    if key is not None:
+                        self.outbox.mark_delivered(key)
+            except Exception as e:
+                # アウトボックスの読み書きの失敗（ロック・ディスクフルなど）でも送信スレッドは止めず、
+                # 結果を待っている側に途中までの送信数を返す（残りは次回の実行で再送される）
+                print(f"Error in Slack delivery: {e}")
+            finally:
+                future.set_result((sent, total))
+
+    def _post(self, webhook_url, message):
+        """1メッセージを送る。送れたら None、失敗したらエラーを返す"""
+        try:
+            response = http_client.request(
+                "POST",
+                webhook_url,
+                retry=http_client.RetryPolicy(non_idempotent_statuses=http_client.RetryPolicy.RETRY_STATUSES),
+                data=json.dumps(message),
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            return None
+        except requests.exceptions.RequestException as e:
+            return e
+        except Exception as e:
+            # 想定外のエラーでも送信スレッドは止めない
+            return e
+
+
+_delivery = None
+_delivery_lock = threading.Lock()
+
+
+def get_delivery():
+    """全ソースで共有する SlackDelivery（config.OUTBOX_CONFIG のアウトボックス付き）を返す"""
+    global _delivery
+    with _delivery_lock:
+        if _delivery is None:
+            cfg = config.OUTBOX_CONFIG
+            outbox = Outbox(cfg["PATH"], cfg["DEDUP_SECONDS"], cfg["MAX_AGE_SECONDS"]) if cfg["ENABLED"] else None
+            _delivery = SlackDelivery(outbox=outbox)
+        return _delivery
@@ -0,0 +1,146 @@
+import unicodedata
+from collections import deque
+from datetime import datetime
+
+from .base import JST
+
+
+def _normalize(text):
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+class AhoCorasick:
+    """
+    複数のパターンを文字列の1回の走査でまとめて探す Aho-Corasick オートマトン。
+
+    パターンごとに整数の値（購読者のビットマスク）を持たせ、search() は見つかったパターンの値の OR を返す。
+    パターンの数が増えても走査の手間は文字列の長さにしか比例しない。
+    """
+
+    def __init__(self, patterns):
+        # patterns: (パターン, 値) の組。同じパターンの値は OR でまとめる
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [0]
+        for pattern, value in patterns:
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(0)
+                node = nxt
+            self._out[node] |= value
+
+        # 幅優先で失敗遷移を作り、失敗先の出力を合わせておく（search で失敗先を辿り直さなくて済む）
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+                queue.append(nxt)
+
+    def search(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        found = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            found |= out[node]
+        return found
+
+
+class SubscriptionIndex:
+    """
+    購読者（config.SUBSCRIBERS）の条件をまとめてコンパイルし、イベントを購読者ごとに振り分ける。
+
+    購読者の集合はビットマスク（i ビット目 = i 番目の購読者）で表す。
+    キーワード・除外キーワードはタイトルと説明文に対する1つの Aho-Corasick オートマトンに、
+    開催地は開催場所・住所に対するもう1つのオートマトンにまとめ、
+    開催日は「今日から何日後までを受け取るか」ごとのビットマスクを前もって作っておく。
+    イベント1件あたりの処理は2回の走査と数回のビット演算だけなので、購読者が増えても変わらない。
+
+    購読者は name, keywords（いずれかを含む。空なら全件）, exclude_keywords（含むものは除外）,
+    locations（いずれかを開催場所・住所に含む。空なら全件）, days_ahead（None なら制限なし）を持つ dict。
+    """
+
+    def __init__(self, subscribers):
+        self.subscribers = list(subscribers)
+        keyword_patterns, exclude_patterns, location_patterns = [], [], []
+        self._any_keyword = 0
+        self._any_location = 0
+        horizons = {}
+        self._any_date = 0
+        for i, sub in enumerate(self.subscribers):
+            bit = 1 << i
+            keywords = [_normalize(k) for k in sub.get("keywords") or []]
+            if keywords:
+                keyword_patterns.extend((k, bit) for k in keywords)
+            else:
+                self._any_keyword |= bit
+            exclude_patterns.extend((_normalize(k), bit) for k in sub.get("exclude_keywords") or [])
+            locations = [_normalize(loc) for loc in sub.get("locations") or []]
+            if locations:
+                location_patterns.extend((loc, bit) for loc in locations)
+            else:
+                self._any_location |= bit
+            if sub.get("days_ahead") is None:
+                self._any_date |= bit
+            else:
+                horizons[sub["days_ahead"]] = horizons.get(sub["days_ahead"], 0) | bit
+
+        # 除外キーワードは別の値の空間にすると走査が2回になるので、ビットを購読者数だけずらして同じオートマトンに入れる
+        self._exclude_shift = len(self.subscribers)
+        self._text_matcher = AhoCorasick(
+            keyword_patterns + [(k, bit << self._exclude_shift) for k, bit in exclude_patterns]
+        )
+        self._keyword_mask = (1 << self._exclude_shift) - 1
+        self._location_matcher = AhoCorasick(location_patterns)
+
+        # _date_masks[d] = d 日後のイベントを受け取る購読者（d が上限を超えたら _any_date のみ）
+        self._date_masks = []
+        mask = self._any_date
+        for days in range(max(horizons, default=-1), -1, -1):
+            mask |= horizons.get(days, 0)
+            self._date_masks.append(mask)
+        self._date_masks.reverse()
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def match(self, ev, today=None):
+        """ev を受け取る購読者のビットマスク"""
+        today = today or datetime.now(JST).date()
+        found = self._text_matcher.search(_normalize(f"{ev.title}\n{ev.summary or ''}"))
+        keyword = (found & self._keyword_mask) | self._any_keyword
+        excluded = found >> self._exclude_shift
+        location = self._location_matcher.search(_normalize(f"{ev.place or ''}\n{ev.address or ''}")) | self._any_location
+        if ev.date is None:
+            date = self._any_date
+        else:
+            days = max(0, (ev.date - today).days)
+            date = self._date_masks[days] if days < len(self._date_masks) else self._any_date
+        return keyword & location & date & ~excluded
+
+    def route(self, events, today=None):
+        """購読者の name -> 受け取るイベントのリスト（events の順序のまま。該当なしの購読者は含まない）"""
+        today = today or datetime.now(JST).date()
+        routes = {}
+        for ev in events:
+            mask = self.match(ev, today)
+            while mask:
+                low = mask & -mask
+                routes.setdefault(self.subscribers[low.bit_length() - 1]["name"], []).append(ev)
+                mask ^= low
+        return routes
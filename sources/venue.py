@@ -0,0 +1,604 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from .base import BaseEventSource, Event, JST
+from .congestion_model import CongestionModel
+from .gemini import create_model
+from .metrics import get_metrics
+from .prediction_cache import PredictionCache
+from .renderer import get_renderer
+import config
+import hashlib
+import json
+import re
+import threading
+import time
+from urllib.parse import urljoin
+
+
+_UNSET = object()
+_TABLE_END = re.compile(r"</table\s*>", re.IGNORECASE)
+FIELDS = ("date", "title", "open", "start", "end")
+
+
+def load_venue(key):
+    """config.VENUES の登録名から、既定値（config.VENUE_DEFAULTS）を補った会場の設定を返す"""
+    if key not in config.VENUES:
+        raise KeyError(f"config.VENUES に登録されていない会場です: {key}")
+    return {**config.VENUE_DEFAULTS, **config.VENUES[key], "key": key}
+
+
+def _slice_table(html, table_id):
+    """HTMLから table#<table_id> の部分だけを文字列として切り出す（見つからなければ None）"""
+    start = re.search(r"""<table\b[^>]*\bid\s*=\s*["']?""" + re.escape(table_id) + r"""\b""", html, re.IGNORECASE)
+    if not start:
+        return None
+    end = _TABLE_END.search(html, start.end())
+    if not end:
+        return None
+    fragment = html[start.start():end.end()]
+    # 入れ子の表があると最初の </table> で切れてしまうので、その場合は切り出さない
+    if fragment.lower().count("<table") > 1:
+        return None
+    return fragment
+
+
+def _text(element):
+    return "".join(s.strip() for s in element.itertext())
+
+
+def _rows_lxml(html, venue):
+    """
+    lxml で row_xpath の各行を読み、行ごとに (項目名 -> 文字列, 最初のリンク先) を返す。
+
+    columns の数値は行の直下の td/th の位置、文字列は行からの相対 XPath。
+    行に該当するセル・要素がない項目は None にする。
+    """
+    import lxml.html
+
+    root = lxml.html.fromstring(html)
+    rows = []
+    for row in root.xpath(venue["row_xpath"])[venue["skip_rows"]:]:
+        cells = [el for el in row if el.tag in ("td", "th")]
+        values = {}
+        for field, column in venue["columns"].items():
+            if isinstance(column, int):
+                values[field] = _text(cells[column]) if column < len(cells) else None
+            else:
+                found = row.xpath(column)
+                if not found:
+                    values[field] = None
+                else:
+                    values[field] = found[0].strip() if isinstance(found[0], str) else _text(found[0])
+        hrefs = row.xpath(venue["link_xpath"])
+        rows.append((values, str(hrefs[0]) if hrefs else None))
+    return rows
+
+
+def _rows_bs4(html, venue):
+    """
+    lxml が使えない場合の _rows_lxml の代わり（BeautifulSoup + SoupStrainer）。
+
+    XPath は使えないので、table_id の表の行から位置（数値）で指定した項目だけを取り出す。
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    if not venue["table_id"]:
+        return []
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("table", id=venue["table_id"]))
+    table = soup.find("table", id=venue["table_id"])
+    if not table:
+        return []
+    rows = []
+    for tr in table.find_all("tr")[venue["skip_rows"]:]:
+        cells = tr.find_all(["td", "th"], recursive=False)
+        values = {
+            field: cells[column].get_text(strip=True) if column < len(cells) else None
+            for field, column in venue["columns"].items()
+            if isinstance(column, int)
+        }
+        link = tr.find("a", href=True)
+        rows.append((values, link["href"] if link else None))
+    return rows
+
+
+def parse_venue_page(html, venue, page_url):
+    """
+    会場のスケジュールページからイベント行の dict（date / title / open / start / end / event_url）のリストを返す。
+
+    全会場で共通のパース処理。table_id があればその表だけを切り出してから lxml でパースし、
+    lxml がなければ SoupStrainer で表だけに絞った BeautifulSoup で読む。title のない行は除外する。
+    """
+    fragment = (_slice_table(html, venue["table_id"]) if venue["table_id"] else None) or html
+    try:
+        rows = _rows_lxml(fragment, venue)
+    except ImportError:
+        rows = _rows_bs4(fragment, venue)
+
+    data_rows = []
+    for values, href in rows:
+        if values.get("title") is None:
+            continue
+        row = {field: values.get(field) or "" for field in FIELDS}
+        row["event_url"] = urljoin(page_url, href) if href else None
+        data_rows.append(row)
+    return data_rows
+
+
+class VenueSource(BaseEventSource):
+    """
+    config.VENUES の設定だけで動く、会場のスケジュールページのソース。
+
+    対象の全会場・全月のページを1つのスレッドプールで並行して取得し、同じパース処理
+    （parse_venue_page）でイベントにする。取得したHTMLにイベント行がない会場は、
+    render の設定に従ってヘッドレスブラウザで描画してから読む。
+    イベントには手元のモデルと Gemini で会場の最寄り駅の混雑予測を付けて通知する。
+    """
+
+    def __init__(self, webhook_url, name="venue", options=None):
+        # BaseEventSource 側の初期化（webhook_url 保持）
+        super().__init__(webhook_url, name=name, options=options)
+        self.settings = self._load_settings()
+        self.venues = [load_venue(key) for key in (self.settings["VENUES"] or config.VENUES)]
+        self._stations = {venue["name"]: venue["station"] for venue in self.venues}
+
+        # Gemini のクライアントは初めて予測するときに作る（SDKのインポートが重いため）
+        gemini = config.GEMINI_CONFIG
+        self._model = _UNSET
+        self._model_lock = threading.Lock()
+
+        # 同じ会場・同じ公演（イベント名＋開演時間）の予測は使い回す
+        self.prediction_cache = PredictionCache(
+            gemini["PREDICTION_CACHE_PATH"],
+            namespace=f"{gemini['MODEL']}:v{gemini['PROMPT_VERSION']}",
+            ttl_seconds=gemini["PREDICTION_CACHE_TTL_DAYS"] * 86400,
+            max_entries=gemini["PREDICTION_CACHE_MAX_ENTRIES"],
+        )
+
+        # 過去の Gemini の予測から似た公演の混雑を推定する手元のモデル（確信度が低いときだけ Gemini を呼ぶ）
+        local = config.CONGESTION_MODEL_CONFIG
+        self.congestion_model = CongestionModel(
+            local["HISTORY_PATH"],
+            min_confidence=local["MIN_CONFIDENCE"],
+            neighbors=local["NEIGHBORS"],
+            min_similarity=local["MIN_SIMILARITY"],
+            max_history=local["MAX_HISTORY"],
+            min_neighbors=local["MIN_NEIGHBORS"],
+            exact_similarity=local["EXACT_SIMILARITY"],
+        ) if local["ENABLED"] else None
+
+    def _load_settings(self):
+        return {**config.VENUE_SOURCE_CONFIG, **self.options}
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is _UNSET:
+                self._model = create_model()
+            return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+
+    def fetch_events(self):
+        """
+        今日から LOOKAHEAD_DAYS 日後までのイベントを返す。
+
+        全会場について期間にかかる月のページを共有のスレッドプールで並行して取得・パースし、
+        日付ごとの索引（self.events_by_date）を作ってから期間内のイベントを取り出す。
+        """
+        now = datetime.now(JST)
+        window = [now.date() + timedelta(days=d) for d in range(self.settings["LOOKAHEAD_DAYS"] + 1)]
+        months = list(dict.fromkeys((d.year, d.month) for d in window))
+        pages = [(venue, year, month) for venue in self.venues for year, month in months]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.settings["MAX_WORKERS"], len(pages)))) as pool:
+            page_events = list(pool.map(lambda page: self._fetch_page(*page), pages))
+
+        metrics = get_metrics()
+        with metrics.stage(self.name, "filter"):
+            self.events_by_date = {}
+            for events in page_events:
+                for ev in events:
+                    self.events_by_date.setdefault(ev.date, []).append(ev)
+            filtered = self._filter_events(window)
+
+        metrics.incr("events_total", sum(len(events) for events in page_events), source=self.name, stage="fetched")
+        metrics.incr("events_total", len(filtered), source=self.name, stage="kept")
+        return filtered
+
+    def events_on(self, day):
+        """直近の fetch_events で取得した索引から、指定日（date）のイベントを返す"""
+        return list(getattr(self, "events_by_date", {}).get(day, []))
+
+    def _fetch_page(self, venue, year, month):
+        """1会場・1か月分のスケジュールページを取得し、Event のリストを返す"""
+        page_url = venue["url_template"].format(year=year, month=month)
+        label = f"{venue['name']} {year}-{month:02d}"
+        print(f"{venue['name']}スケジュールURL: {page_url}")
+
+        metrics = get_metrics()
+        if venue["render"] != "always":
+            # まず requests で取得（ディスクキャッシュ経由。本文が変わっていなければパースもしない）
+            try:
+                with metrics.stage(self.name, "http_fetch"):
+                    res = self.http_get(page_url, timeout=15, ttl=venue["cache_ttl_seconds"])
+                res.raise_for_status()
+                if res.from_cache or res.not_modified:
+                    print(f"   ♻️ キャッシュ済みのページを使用します ({label})")
+                with metrics.stage(self.name, "parse"):
+                    rows = self.parse_cached(res, self._parser_name(venue), lambda html: parse_venue_page(html, venue, page_url))
+                    events = self._to_events(rows, venue, year, month)
+                if events:
+                    print(f"   ✅ ページソースから取得 ({label}): {len(events)}件")
+                    metrics.incr("venue_pages_total", venue=venue["key"], result="ok")
+                    return events
+                print(f"   ⚠️ ページソースにイベント行が見つかりません ({label})。JSで描画されている可能性があります。")
+            except Exception as e:
+                print(f"   ❌ requests でページ取得失敗 ({label}): {e}")
+
+            if venue["render"] == "never":
+                metrics.incr("venue_pages_total", venue=venue["key"], result="empty")
+                return []
+
+        # Playwright で描画して取得（常駐ブラウザで wait_selector が現れるまで待つ）
+        try:
+            with metrics.stage(self.name, "render"):
+                content = get_renderer().render(page_url, wait_selector=venue["wait_selector"])
+        except ImportError as e:
+            print("   ❌ Playwright をインポートできません。pip install playwright が必要です。詳細:", e)
+            metrics.incr("venue_pages_total", venue=venue["key"], result="error")
+            return []
+        except Exception as e:
+            print(f"   ❌ Playwright 実行中にエラー ({label}): {e}")
+            metrics.incr("venue_pages_total", venue=venue["key"], result="error")
+            return []
+
+        with metrics.stage(self.name, "parse"):
+            events = self._to_events(parse_venue_page(content, venue, page_url), venue, year, month)
+        if events:
+            print(f"   ✅ Headless でレンダリングして取得 ({label}): {len(events)}件")
+            metrics.incr("venue_pages_total", venue=venue["key"], result="rendered")
+        else:
+            print(f"   ⚠️ レンダリング後でもイベント行が見つかりません ({label})。")
+            metrics.incr("venue_pages_total", venue=venue["key"], result="empty")
+        return events
+
+    @staticmethod
+    def _parser_name(venue):
+        """パース結果のキャッシュ名。会場の設定を変えたら以前のパース結果は使わない"""
+        spec = json.dumps({k: venue[k] for k in ("row_xpath", "skip_rows", "columns", "link_xpath", "table_id")}, sort_keys=True)
+        return f"venue-{hashlib.sha256(spec.encode('utf-8')).hexdigest()[:12]}"
+
+    def _to_events(self, rows, venue, year, month):
+        """
+        パースした行を Event に変換する。date の文字列は会場の date_pattern で読み、
+        月（年）の指定がなければページの月（年）とみなす。日付が読めない行は除外する。
+        """
+        pattern = re.compile(venue["date_pattern"])
+        events = []
+        for row in rows or []:
+            m = pattern.search(row.get("date") or "")
+            if not m:
+                continue
+            parts = m.groupdict()
+            ev_month = int(parts["month"]) if parts.get("month") else month
+            if parts.get("year"):
+                ev_year = int(parts["year"])
+            else:
+                ev_year = year
+                # 12月のページに載った 1/5 などは翌年、1月のページの 12/28 などは前年
+                if ev_month - month > 6:
+                    ev_year -= 1
+                elif month - ev_month > 6:
+                    ev_year += 1
+            try:
+                day = datetime(ev_year, ev_month, int(parts["day"])).date()
+            except ValueError:
+                continue
+
+            start_time = row.get("start") or ""
+            started_at = None
+            t = re.match(r"(\d{1,2}):(\d{2})", start_time)
+            if t and int(t.group(1)) < 24:
+                started_at = datetime(day.year, day.month, day.day, int(t.group(1)), int(t.group(2)), tzinfo=JST)
+
+            events.append(Event(
+                source=self.name,
+                event_id=f"{venue['key']}:{day.isoformat()}:{row.get('title')}",
+                title=row.get("title") or "タイトル不明",
+                url=row.get("event_url"),
+                started_at=started_at,
+                date=day,
+                open_time=row.get("open") or "",
+                start_time=start_time,
+                end_time=row.get("end") or "",
+                place=venue["name"],
+            ))
+        return events
+
+    def _filter_events(self, window):
+        """索引から期間（日付のリスト）内のイベントを日付順に取り出す"""
+        filtered = []
+        for day in window:
+            filtered.extend(self.events_on(day))
+        return filtered
+
+    def _venue_text(self, venue):
+        """プロンプトに書く会場（最寄り駅が分かれば併記する）"""
+        station = self._stations.get(venue)
+        return f"{venue}（最寄り駅: {station}）" if station else venue
+
+    # ★ ここから混雑予測
+    def _analyze_congestion_ai(self, venue, event_title, start_time):
+        """Gemini に会場・イベント名・開演時間を渡して混雑レベルなどを予測させる。"""
+        cached = self.prediction_cache.get(event_title, start_time, venue=venue)
+        if cached:
+            print(f"   ♻️ 予測キャッシュを使用: {event_title[:30]}")
+            get_metrics().incr("prediction_cache_total", source=self.name, result="hit")
+            return cached
+
+        if not self.model:
+            return None
+
+        prompt = f"""
+あなたはイベント会場の混雑予測AIです。
+以下のイベント情報に基づいて、会場の最寄り駅周辺の混雑レベルと予測理由を簡潔に答えてください。
+
+会場: {self._venue_text(venue)}
+イベント名: {event_title}
+開演時間: {start_time}
+
+出力フォーマット（JSONのみ、Markdownなどの装飾なし）:
+{{
+  "level": "Lv.1(閑散)〜Lv.5(激混み)のいずれか",
+  "peak_time": "混雑のピーク時間帯（文字列）",
+  "reason": "予測の理由（30文字以内）"
+}}
+"""
+
+        try:
+            prediction = self._generate_json(prompt, kind="single")
+            if not self._is_valid_prediction(prediction):
+                print(f"Gemini API Error: 想定外の形式です: {str(prediction)[:100]}")
+                return None
+
+            self.prediction_cache.put(event_title, start_time, prediction, venue=venue)
+            return prediction
+        except Exception as e:
+            print(f"Gemini API Error: {e}")
+            return None
+
+    def _analyze_congestion_batch(self, targets):
+        """
+        複数イベントの混雑予測を1回の Gemini 呼び出しでまとめて行う。
+
+        targets は (会場, イベント名, 開演時間) のリスト。戻り値は targets の添字 -> 予測 の dict で、
+        パースに失敗した・形式が崩れていたイベントは含まれない（呼び出し側で個別予測にフォールバック）。
+        """
+        if not self.model or not targets:
+            return {}
+
+        event_lines = "\n".join(
+            f"- id: {i} / 会場: {self._venue_text(venue)} / イベント名: {title} / 開演時間: {start_time}"
+            for i, (venue, title, start_time) in enumerate(targets)
+        )
+        prompt = f"""
+あなたはイベント会場の混雑予測AIです。
+以下の各イベントについて、会場の最寄り駅周辺の混雑レベルと予測理由を簡潔に答えてください。
+
+{event_lines}
+
+出力フォーマット（JSON配列のみ、Markdownなどの装飾なし。各イベントにつき1要素）:
+[
+  {{
+    "id": 対応するイベントのid（数値）,
+    "level": "Lv.1(閑散)〜Lv.5(激混み)のいずれか",
+    "peak_time": "混雑のピーク時間帯（文字列）",
+    "reason": "予測の理由（30文字以内）"
+  }}
+]
+"""
+
+        try:
+            items = self._generate_json(prompt, kind="batch")
+        except Exception as e:
+            print(f"Gemini API Error (batch): {e}")
+            return {}
+        if not isinstance(items, list):
+            print(f"Gemini API Error (batch): 配列ではない応答です: {str(items)[:100]}")
+            return {}
+
+        results = {}
+        for item in items:
+            try:
+                idx = int(item.get("id"))
+            except (AttributeError, TypeError, ValueError):
+                continue
+            if 0 <= idx < len(targets) and self._is_valid_prediction(item):
+                prediction = {k: item[k] for k in ("level", "peak_time", "reason")}
+                results[idx] = prediction
+                venue, title, start_time = targets[idx]
+                self.prediction_cache.put(title, start_time, prediction, venue=venue)
+        return results
+
+    def _predict_congestion(self, events):
+        """
+        events と同じ並びで混雑予測（または None）を返す。
+
+        キャッシュにない公演は、まず過去の予測から学んだ手元のモデル（CongestionModel）で推定し、
+        確信度が低いものだけを Gemini でまとめて予測する（BATCH 有効時）。
+        まとめて予測できなかったものは1件ずつ並行して予測する。
+        まとめての呼び出しも1件ずつの呼び出しもスレッドプールで動かし、DEADLINE_SECONDS を共有する。
+        期限を超えた分は待たずに None（=「AI予測: 利用不可」）とする。
+        Gemini の予測は手元のモデルの履歴に加える。
+        """
+        gemini = config.GEMINI_CONFIG
+        deadline = time.monotonic() + gemini["DEADLINE_SECONDS"]
+        keys = [(self._venue(ev), ev.title, ev.start_time) for ev in events]
+        predictions = {key: self.prediction_cache.get(key[1], key[2], venue=key[0]) for key in set(keys)}
+        misses = [key for key in dict.fromkeys(keys) if not predictions[key]]
+        metrics = get_metrics()
+        metrics.incr("prediction_cache_total", len(predictions) - len(misses), source=self.name, result="hit")
+        metrics.incr("prediction_cache_total", len(misses), source=self.name, result="miss")
+
+        first_event = {}
+        for ev, key in zip(events, keys):
+            first_event.setdefault(key, ev)
+        if misses and self.congestion_model is not None:
+            for key in misses:
+                ev = first_event[key]
+                predictions[key], _ = self.congestion_model.predict(
+                    self._venue(ev), ev.title, ev.date.weekday(), ev.start_time
+                )
+            local = sum(1 for key in misses if predictions[key])
+            metrics.incr("congestion_model_total", local, source=self.name, result="local")
+            metrics.incr("congestion_model_total", len(misses) - local, source=self.name, result="fallback")
+            if local:
+                print(f"   📊 過去の予測から推定: {local}/{len(misses)}件（残りは Gemini で予測）")
+            misses = [key for key in misses if not predictions[key]]
+        remote = list(misses)
+
+        if misses and self.model:
+            pool = ThreadPoolExecutor(max_workers=gemini["MAX_CONCURRENCY"])
+            if gemini["BATCH"]:
+                future = pool.submit(self._analyze_congestion_batch, misses)
+                done, _ = wait([future], timeout=max(0.0, deadline - time.monotonic()))
+                if done:
+                    batch = future.result()
+                    print(f"   🤖 Gemini まとめて予測: {len(batch)}/{len(misses)}件")
+                    for idx, prediction in batch.items():
+                        predictions[misses[idx]] = prediction
+                    misses = [key for key in misses if not predictions[key]]
+                else:
+                    print(f"   ⏱️ Gemini のまとめて予測が期限内に終わりませんでした: {len(misses)}件は予測なしで送信します")
+                    misses = []
+
+            if misses:
+                futures = {pool.submit(self._analyze_congestion_ai, *key): key for key in misses}
+                done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+                for future in done:
+                    predictions[futures[future]] = future.result()
+                if not_done:
+                    print(f"   ⏱️ Gemini 予測が期限内に終わりませんでした: {len(not_done)}件は予測なしで送信します")
+            # 期限切れの呼び出しは待たない（結果はキャッシュに入れば次回使われる）
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        if self.congestion_model is not None:
+            for key in remote:
+                if predictions.get(key):
+                    ev = first_event[key]
+                    self.congestion_model.record(
+                        self._venue(ev), ev.title, ev.date.weekday(), ev.start_time, predictions[key]
+                    )
+
+        return [predictions[key] for key in keys]
+
+    def _venue(self, ev):
+        """予測キャッシュ・手元の混雑モデルで履歴を分ける会場名"""
+        return ev.place or self.name
+
+    def _generate_json(self, prompt, kind="single"):
+        """Gemini にプロンプトを送り、応答をJSONとして解釈して返す（呼び出し回数・時間・トークン数を記録する）"""
+        metrics = get_metrics()
+        model_name = config.GEMINI_CONFIG["MODEL"]
+        with metrics.timer("llm_request_seconds", model=model_name, kind=kind):
+            try:
+                response = self.model.generate_content(prompt)
+            except Exception:
+                metrics.incr("llm_requests_total", model=model_name, kind=kind, result="error")
+                raise
+        metrics.incr("llm_requests_total", model=model_name, kind=kind, result="ok")
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            metrics.incr("llm_tokens_total", getattr(usage, "prompt_token_count", 0) or 0, model=model_name, type="prompt")
+            metrics.incr("llm_tokens_total", getattr(usage, "candidates_token_count", 0) or 0, model=model_name, type="output")
+
+        text = response.text.strip()
+        # モデルが ```json で囲って返してしまうパターンに対応
+        text = re.sub(r"^```json\s*", "", text)
+        text = re.sub(r"^```\s*", "", text)
+        text = re.sub(r"\s*```$", "", text)
+
+        return json.loads(text)
+
+    @staticmethod
+    def _is_valid_prediction(prediction):
+        return isinstance(prediction, dict) and all(k in prediction for k in ("level", "peak_time", "reason"))
+
+    @staticmethod
+    def _format_date(ev):
+        """「12/7(日)」形式の日付表示。今日のイベントには「今日」を付ける"""
+        day = ev.date
+        label = f"{day.month}/{day.day}({'月火水木金土日'[day.weekday()]})"
+        if day == datetime.now(JST).date():
+            label = f"今日 {label}"
+        return label
+
+    def create_message(self, events):
+        if not events:
+            return None
+
+        blocks = [
+            {
+                "type": "header",
+                "text": {
+                    "type": "plain_text",
+                    "text": self.settings["HEADER"],
+                    "emoji": True,
+                },
+            },
+            {"type": "divider"},
+        ]
+
+        # ★ AI 混雑予測（キャッシュ → 手元のモデル → まとめて予測 → 1件ずつ予測 の順に試す）
+        with get_metrics().stage(self.name, "llm"):
+            ai_predictions = self._predict_congestion(events)
+
+        for ev, ai_prediction in zip(events, ai_predictions):
+            title = ev.title
+            date_text = self._format_date(ev)
+            start_time = ev.start_time
+            end_time = ev.end_time
+            url = ev.url
+
+            if ai_prediction:
+                label = "混雑予測（過去の傾向）" if ai_prediction.get("model") == "local" else "AI混雑予測"
+                congestion_info = (
+                    f"*{label}*: `{ai_prediction['level']}`\n"
+                    f"⏰ *ピーク予想*: {ai_prediction['peak_time']}\n"
+                    f"*理由*: {ai_prediction['reason']}"
+                )
+            else:
+                congestion_info = "AI予測: 利用不可 (APIキー未設定など)"
+
+            time_parts = [
+                p
+                for p in (
+                    date_text,
+                    start_time and f"開演 {start_time}",
+                    end_time and f"終演 {end_time}",
+                )
+                if p
+            ]
+            time_text = " · ".join(time_parts) if time_parts else "日時不明"
+            title_text = f"<{url}|{title}>" if url else title
+
+            # 本文に混雑予測を追加
+            body_lines = [
+                f"*{time_text}*  {title_text}",
+                f"会場: {ev.place}",
+                "----------------------------",
+                congestion_info,
+            ]
+            body_text = "\n".join(body_lines)
+
+            blocks.append(
+                {
+                    "type": "section",
+                    "text": {"type": "mrkdwn", "text": body_text},
+                }
+            )
+            blocks.append({"type": "divider"})
+
+        return {"blocks": blocks}